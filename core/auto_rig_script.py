@@ -1,6 +1,48 @@
-import maya.cmds as cmds
-import maya.api.OpenMaya as om
+import collections
+import concurrent.futures
+import contextlib
+import hashlib
+import json
+import logging
+import logging.handlers
+import mmap
 import os
+import re
+import shlex
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+# Planning (plan_auto_rig) runs without Maya, every other stage needs it
+inMaya = False
+try:
+    import maya.cmds as cmds
+    import maya.api.OpenMaya as om
+    import maya.api.OpenMayaAnim as oma
+
+    inMaya = True
+except ImportError:
+    pass
+
+# Vectorized LOD weight transfer, copySkinWeights is used without NumPy
+hasNumpy = False
+try:
+    import numpy as np
+
+    hasNumpy = True
+except ImportError:
+    pass
+
+hasScipy = False
+try:
+    from scipy.spatial import cKDTree
+
+    hasScipy = True
+except ImportError:
+    pass
 
 inToolKit = False
 
@@ -21,20 +63,154 @@ except:
 
 shotgrid = None
 
-if inToolKit is True:
-    sg = sgtk.platform.current_engine().shotgun
-elif hasShotgunAPI is True:
-    sg = shotgun_api3.Shotgun(
-        "https://p3d.shotgunstudio.com/",
-        script_name="ScriptAccessJulienM",
-        api_key="XXXXXXXXX",
-    )
+
+def create_shotgun_connection():
+    """
+    Connect to ShotGrid through the running toolkit engine, or the
+    shotgun_api3 script key outside of toolkit.
+
+    Returns:
+        The ShotGrid connection, or None if neither API is available.
+    """
+    if inToolKit is True and sgtk.platform.current_engine() is not None:
+        # The engine hands out one connection per thread
+        return sgtk.platform.current_engine().shotgun
+    elif hasShotgunAPI is True:
+        return shotgun_api3.Shotgun(
+            "https://p3d.shotgunstudio.com/",
+            script_name="ScriptAccessJulienM",
+            api_key="XXXXXXXXX",
+        )
+    return None
+
+
+# Root logger of the tool, each stage logs through a child so its verbosity
+# can be tuned separately with set_stage_verbosity
+LOGGER = logging.getLogger("auto_rig_prop")
+LOGGER.setLevel(logging.INFO)
+if not LOGGER.hasHandlers():
+    # mayapy has no handler installed, Maya's UI routes the root logger to
+    # the Script Editor already
+    LOGGER.addHandler(logging.StreamHandler(sys.stdout))
+IMPORT_LOGGER = LOGGER.getChild("import")
+SHOTGRID_LOGGER = LOGGER.getChild("shotgrid")
+SCENE_LOGGER = LOGGER.getChild("scene")
+BIND_LOGGER = LOGGER.getChild("bind")
+
+
+class LogCounter(logging.Handler):
+    """Counts the records emitted per stage and level."""
+
+    def __init__(self):
+        super(LogCounter, self).__init__(logging.DEBUG)
+        self.counts = collections.Counter()
+
+    def emit(self, record):
+        self.counts[(record.name, record.levelname)] += 1
+
+
+class JsonLogFormatter(logging.Formatter):
+    """Formats records as one JSON object per line."""
+
+    def format(self, record):
+        entry = {
+            "time": record.created,
+            "stage": record.name,
+            "level": record.levelname,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry)
+
+
+LOG_COUNTER = LogCounter()
+LOGGER.addHandler(LOG_COUNTER)
+
+
+def set_stage_verbosity(stage, level):
+    """
+    Set the log level of one stage ("import", "shotgrid", "scene", "bind"),
+    or of the whole tool when stage is None.
+
+    Args:
+        stage (str): The stage name.
+        level (int): A logging level, e.g. logging.WARNING for quiet runs.
+    """
+    logger = LOGGER.getChild(stage) if stage else LOGGER
+    logger.setLevel(level)
+
+
+def add_log_sink(path, json_lines=False, capacity=1000,
+                 level=logging.DEBUG):
+    """
+    Write the tool's records to a file through a memory buffer, flushed every
+    capacity records, on errors and at exit.
+
+    Args:
+        path (str): The log file.
+        json_lines (bool): Write one JSON object per record instead of text.
+        capacity (int): Number of records buffered before writing.
+        level (int): Minimum level written to the file.
+
+    Returns:
+        logging.Handler: The sink, pass it to remove_log_sink when done.
+    """
+    file_handler = logging.FileHandler(path, delay=True)
+    if json_lines:
+        file_handler.setFormatter(JsonLogFormatter())
+    else:
+        file_handler.setFormatter(logging.Formatter(
+            "%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    sink = logging.handlers.MemoryHandler(
+        capacity, flushLevel=logging.ERROR, target=file_handler)
+    sink.setLevel(level)
+    LOGGER.addHandler(sink)
+    return sink
+
+
+def remove_log_sink(sink):
+    """
+    Flush and detach a sink created by add_log_sink.
+
+    Args:
+        sink (logging.Handler): The sink to remove.
+    """
+    LOGGER.removeHandler(sink)
+    target = sink.target
+    sink.close()
+    target.close()
+
+
+def get_log_summary():
+    """
+    Returns:
+        dict: "stage level" -> number of records emitted so far.
+    """
+    return {f"{stage} {level}": count
+            for (stage, level), count in sorted(LOG_COUNTER.counts.items())}
 
 
 REFERENCE_PATH = os.path.abspath(
     os.path.join(os.path.dirname(__file__), '..',
                  'modules\\basic_prop_v001.ma'))
 
+# Attributes tagging the nodes owned by the rig (Frankenstein templates)
+RIG_TAG_ATTRIBUTES = ["rig_objectType", "pip_groupType"]
+
+# Role -> node name of the template nodes used by the rig stages
+TEMPLATE_ROLES = {
+    "module": "module",
+    "main_joint": "main_JNT",
+    "local_controller": "local_FK_CON",
+    "global_controller": "global_FK_CON",
+}
+
+# Role -> node name of the nodes expected in the geometry publish
+GEOMETRY_ROLES = {
+    "rig_group": "rig_RIG",
+}
+
 
 def get_current_project_id():
     # Get the current context from the current engine
@@ -49,7 +225,533 @@ def get_current_project_id():
     return context.project['id']
 
 
-PROJECT_ID = get_current_project_id()
+class RigJob(object):
+    """
+    Everything a rig run depends on besides the scene: the ShotGrid
+    connection, the project, the template and the node naming.
+
+    Pipeline functions take the job explicitly, so several jobs (different
+    projects, templates or connections) can run in one interpreter. A
+    ShotGrid connection is not thread safe, give each thread its own job
+    (see clone).
+    """
+
+    def __init__(self, shotgun=None, project_id=None,
+                 template_path=REFERENCE_PATH, template_roles=None,
+                 geometry_roles=None, geometry_namespace="geo"):
+        """
+        Args:
+            shotgun: ShotGrid connection (see create_shotgun_connection).
+            project_id (int): (Optional) Restrict the Task lookups to this
+                              project.
+            template_path (str): The rig template to import.
+            template_roles (dict): Role -> node name of the template nodes,
+                                   TEMPLATE_ROLES by default.
+            geometry_roles (dict): Role -> node name of the geometry nodes,
+                                   GEOMETRY_ROLES by default.
+            geometry_namespace (str): Namespace of the imported geometry.
+        """
+        self.shotgun = shotgun
+        self.project_id = project_id
+        self.template_path = template_path
+        self.template_roles = dict(template_roles or TEMPLATE_ROLES)
+        self.geometry_roles = dict(geometry_roles or GEOMETRY_ROLES)
+        self.geometry_namespace = geometry_namespace
+
+    @classmethod
+    def from_current_context(cls, **kwargs):
+        """
+        Create a job on the toolkit engine connection and project, or the
+        shotgun_api3 script connection outside of toolkit.
+
+        Args:
+            **kwargs: Overrides of the other RigJob arguments.
+
+        Returns:
+            RigJob: The new job.
+        """
+        kwargs.setdefault("shotgun", create_shotgun_connection())
+        if inToolKit is True and sgtk.platform.current_engine() is not None:
+            kwargs.setdefault("project_id", get_current_project_id())
+        return cls(**kwargs)
+
+    def clone(self, **changes):
+        """
+        Returns:
+            RigJob: A copy of the job, with the given arguments replaced.
+        """
+        arguments = {
+            "shotgun": self.shotgun,
+            "project_id": self.project_id,
+            "template_path": self.template_path,
+            "template_roles": self.template_roles,
+            "geometry_roles": self.geometry_roles,
+            "geometry_namespace": self.geometry_namespace,
+        }
+        arguments.update(changes)
+        return RigJob(**arguments)
+
+    def task_filters(self, asset_id, content):
+        """
+        Returns:
+            list: ShotGrid filters of the Task of an asset, in the job
+                  project when it has one.
+        """
+        filters = [["entity.Asset.id", "is", asset_id],
+                   ["content", "is", content]]
+        if self.project_id is not None:
+            filters.append(
+                ["project", "is", {"type": "Project", "id": self.project_id}])
+        return filters
+
+
+_DEFAULT_RIG_JOB = None
+
+
+def get_default_rig_job():
+    """
+    The job used when a pipeline function is called without one, created
+    from the current context on first use (shelf buttons, script editor).
+
+    Returns:
+        RigJob: The default job.
+    """
+    global _DEFAULT_RIG_JOB
+    if _DEFAULT_RIG_JOB is None:
+        _DEFAULT_RIG_JOB = RigJob.from_current_context()
+    return _DEFAULT_RIG_JOB
+
+
+def get_node_names(handles):
+    """
+    Convert MObjectHandles into node names, skipping deleted nodes.
+
+    Args:
+        handles (list): om.MObjectHandle of the nodes.
+
+    Returns:
+        list: Full DAG paths for DAG nodes, node names otherwise.
+    """
+    names = []
+    for handle in handles:
+        if not handle.isValid():
+            continue
+        node = handle.object()
+        if node.hasFn(om.MFn.kDagNode):
+            names.append(om.MFnDagNode(node).fullPathName())
+        else:
+            names.append(om.MFnDependencyNode(node).name())
+    return names
+
+
+@contextlib.contextmanager
+def collect_new_nodes():
+    """
+    Collect the nodes created while the context is active, for commands that
+    cannot return them (AbcImport).
+
+    Yields:
+        list: Filled on exit with the names of the created nodes.
+    """
+    handles = []
+    callback_id = om.MDGMessage.addNodeAddedCallback(
+        lambda node, *args: handles.append(om.MObjectHandle(node)),
+        "dependNode")
+    new_nodes = []
+    try:
+        yield new_nodes
+    finally:
+        om.MMessage.removeCallback(callback_id)
+        new_nodes.extend(get_node_names(handles))
+
+
+@contextlib.contextmanager
+def preserve_selection():
+    """
+    Restore the user's selection on exit, for commands that select their
+    result (polyUnite, group).
+    """
+    selection = cmds.ls(selection=True, long=True)
+    try:
+        yield
+    finally:
+        selection = [node for node in selection if cmds.objExists(node)]
+        if selection:
+            cmds.select(selection, replace=True)
+        else:
+            cmds.select(clear=True)
+
+
+# Plug-in registering the command apply_modifier runs modifiers through
+UNDO_PLUGIN_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                "auto_rig_undo.py")
+
+
+def apply_modifier(modifier):
+    """
+    Apply an API modifier through the autoRigApplyModifier command, so it is
+    one step on Maya's undo queue. A modifier failing halfway is reverted.
+
+    Args:
+        modifier (om.MDGModifier): The modifier to apply, not applied yet.
+    """
+    if not cmds.pluginInfo(UNDO_PLUGIN_PATH, query=True, loaded=True):
+        cmds.loadPlugin(UNDO_PLUGIN_PATH, quiet=True)
+    plugin = sys.modules["auto_rig_undo"]
+    plugin.PENDING_MODIFIERS.append(modifier)
+    try:
+        cmds.autoRigApplyModifier()
+    except RuntimeError:
+        # A failed command is not on the undo queue, revert it by hand
+        modifier.undoIt()
+        raise
+    finally:
+        if modifier in plugin.PENDING_MODIFIERS:
+            plugin.PENDING_MODIFIERS.remove(modifier)
+
+
+# Names accepted by SceneEditJournal.rename, namespaces included
+VALID_NODE_NAME = re.compile(r"^[A-Za-z_][A-Za-z0-9_:]*$")
+
+
+class SceneEditJournal(object):
+    """
+    Collects scene edits and commits them through a single MDagModifier.
+
+    Helpers append renames, attribute values and reparenting to the journal
+    instead of sending one cmds call per edit. commit() validates every
+    operation before touching the scene, then applies them all at once with
+    apply_modifier, so Ctrl+Z reverts the whole commit in one step.
+    """
+
+    def __init__(self):
+        self.operations = []
+        self.modifier = None
+
+    def __len__(self):
+        return len(self.operations)
+
+    def rename(self, node, new_name):
+        """
+        Queue a rename.
+
+        Args:
+            node (str): Name of the node to rename.
+            new_name (str): The new name of the node.
+        """
+        self.operations.append(("rename", node, new_name))
+
+    def set_attr(self, attribute, value):
+        """
+        Queue an attribute value.
+
+        Args:
+            attribute (str): The "node.attribute" to set.
+            value (bool|int|float|str|om.MMatrix): The value, its type picks
+                                                    the plug setter.
+        """
+        self.operations.append(("set_attr", attribute, value))
+
+    def parent(self, node, parent):
+        """
+        Queue a reparenting, applied with the parent command inside the
+        modifier so the world transform, pivots and joint orient are kept.
+
+        Args:
+            node (str): Name of the DAG node to move.
+            parent (str): Name of its new parent.
+        """
+        self.operations.append(("parent", node, parent))
+
+    def validate(self):
+        """
+        Resolve every queued operation without modifying the scene.
+
+        Returns:
+            list: (kind, target, argument) with nodes resolved to MObjects
+                  and attributes to MPlugs, so earlier renames and
+                  reparenting don't invalidate later operations.
+        """
+        resolved = []
+        errors = []
+        for kind, target, argument in self.operations:
+            selection = om.MSelectionList()
+            try:
+                selection.add(target)
+                if kind == "rename":
+                    if not VALID_NODE_NAME.match(argument):
+                        raise ValueError(f"invalid name '{argument}'")
+                    resolved.append(
+                        (kind, selection.getDependNode(0), argument))
+                elif kind == "set_attr":
+                    if not isinstance(argument,
+                                      (bool, int, float, str, om.MMatrix)):
+                        raise ValueError(
+                            f"unsupported value type {type(argument)}")
+                    resolved.append((kind, selection.getPlug(0), argument))
+                else:
+                    selection.add(argument)
+                    node_path = selection.getDagPath(0)
+                    parent_path = selection.getDagPath(1)
+                    if (parent_path.fullPathName() + "|").startswith(
+                            node_path.fullPathName() + "|"):
+                        raise ValueError(
+                            f"'{argument}' is '{target}' or its descendant")
+                    resolved.append(
+                        (kind, node_path.node(), parent_path.node()))
+            except (RuntimeError, ValueError, TypeError) as e:
+                errors.append(f"{kind} '{target}': {e}")
+
+        if errors:
+            cmds.error("Scene edits rejected:\n" + "\n".join(errors))
+        return resolved
+
+    def commit(self):
+        """
+        Validate and apply every queued operation in one MDagModifier. A
+        failing operation reverts the ones already applied.
+
+        Returns:
+            int: The number of applied operations.
+        """
+        resolved = self.validate()
+        modifier = om.MDagModifier()
+        for kind, target, argument in resolved:
+            if kind == "rename":
+                modifier.renameNode(target, argument)
+            elif kind == "set_attr":
+                self._set_plug_value(modifier, target, argument)
+            else:
+                modifier.commandToExecute(
+                    self._get_parent_command(target, argument))
+
+        apply_modifier(modifier)
+        self.modifier = modifier
+        self.operations = []
+        return len(resolved)
+
+    def rollback(self):
+        """Undo the last commit, right after it."""
+        if self.modifier is None:
+            return
+        if cmds.undoInfo(query=True, state=True):
+            # Through the queue, a later Ctrl+Z would revert it twice
+            cmds.undo()
+        else:
+            self.modifier.undoIt()
+        self.modifier = None
+
+    @staticmethod
+    def _set_plug_value(modifier, plug, value):
+        if isinstance(value, bool):
+            modifier.newPlugValueBool(plug, value)
+        elif isinstance(value, int):
+            modifier.newPlugValueInt(plug, value)
+        elif isinstance(value, float):
+            modifier.newPlugValueDouble(plug, value)
+        elif isinstance(value, str):
+            modifier.newPlugValueString(plug, value)
+        else:
+            modifier.newPlugValue(plug, om.MFnMatrixData().create(value))
+
+    @staticmethod
+    def _get_parent_command(node_object, parent_object):
+        # UUIDs still resolve after the renames and reparenting queued
+        # before this operation in the same modifier
+        uuids = [om.MFnDependencyNode(node).uuid().asString()
+                 for node in (node_object, parent_object)]
+        return 'parent `ls "{}"` `ls "{}"`;'.format(*uuids)
+
+
+class SceneQueryCache(object):
+    """
+    Memoizes read-only scene queries (node type, shapes, attribute existence,
+    node existence) for the duration of a run.
+
+    Entries are dropped by scene callbacks as soon as the node they describe
+    is removed, renamed, reparented or gains/loses an attribute, and negative
+    existence answers are dropped whenever a node is added or renamed.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._values = {}
+        self._keys_by_node = {}
+        self._missing = set()
+        self._watched_nodes = set()
+        self._callback_ids = []
+
+    def start(self):
+        """Register the invalidation callbacks."""
+        self._callback_ids = [
+            om.MDGMessage.addNodeAddedCallback(
+                self._on_node_added, "dependNode"),
+            om.MDGMessage.addNodeRemovedCallback(
+                self._on_node_removed, "dependNode"),
+            om.MNodeMessage.addNameChangedCallback(
+                om.MObject(), self._on_name_changed),
+            om.MDagMessage.addAllDagChangesCallback(self._on_dag_changed),
+        ]
+
+    def stop(self):
+        """Remove every callback and forget the cached answers."""
+        om.MMessage.removeCallbacks(self._callback_ids)
+        self._callback_ids = []
+        self._values.clear()
+        self._keys_by_node.clear()
+        self._missing.clear()
+        self._watched_nodes.clear()
+
+    def stats(self):
+        """
+        Returns:
+            dict: hits, misses and hit_rate of the cache.
+        """
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0}
+
+    def get(self, key, node, compute, watch_attributes=False):
+        """
+        Return the cached answer of a query, computing it on a miss.
+
+        Args:
+            key (tuple): Identifies the query, its second item is the node.
+            node (str): Name of the queried node.
+            compute (callable): Runs the actual query.
+            watch_attributes (bool): The answer depends on the node's
+                                     attribute list.
+        """
+        if key in self._values:
+            self.hits += 1
+            return self._values[key]
+
+        self.misses += 1
+        value = compute()
+        selection = om.MSelectionList()
+        try:
+            selection.add(node)
+        except RuntimeError:
+            # Nothing to attach the entry to, only a node addition or a
+            # rename can change the answer
+            self._missing.add(key)
+            self._values[key] = value
+            return value
+
+        node_object = selection.getDependNode(0)
+        node_hash = om.MObjectHandle(node_object).hashCode()
+        self._keys_by_node.setdefault(node_hash, set()).add(key)
+        if watch_attributes and node_hash not in self._watched_nodes:
+            self._watched_nodes.add(node_hash)
+            self._callback_ids.append(
+                om.MNodeMessage.addAttributeAddedOrRemovedCallback(
+                    node_object, self._on_attribute_changed))
+        self._values[key] = value
+        return value
+
+    def _invalidate(self, node_object):
+        node_hash = om.MObjectHandle(node_object).hashCode()
+        for key in self._keys_by_node.pop(node_hash, ()):
+            self._values.pop(key, None)
+
+    def _invalidate_path_segment(self, name):
+        # Descendants are cached under paths that contain the moved node
+        for key in [key for key in self._values
+                    if name in key[1].split("|")[:-1]]:
+            self._values.pop(key)
+
+    def _invalidate_missing(self):
+        for key in self._missing:
+            self._values.pop(key, None)
+        self._missing.clear()
+
+    def _on_node_added(self, node_object, *args):
+        self._invalidate_missing()
+
+    def _on_node_removed(self, node_object, *args):
+        self._invalidate(node_object)
+
+    def _on_name_changed(self, node_object, previous_name, *args):
+        self._invalidate(node_object)
+        self._invalidate_missing()
+        if node_object.hasFn(om.MFn.kDagNode):
+            self._invalidate_path_segment(previous_name)
+
+    def _on_dag_changed(self, message, child, parent, *args):
+        self._invalidate(child.node())
+        self._invalidate(parent.node())
+        self._invalidate_path_segment(child.partialPathName().split("|")[-1])
+
+    def _on_attribute_changed(self, message, plug, *args):
+        self._invalidate(plug.node())
+
+
+# Cache used by the query_* helpers while scene_query_cache is active
+_QUERY_CACHE = None
+
+
+@contextlib.contextmanager
+def scene_query_cache():
+    """
+    Memoize the query_* helpers while the context is active and print the
+    hit rate on exit.
+
+    Yields:
+        SceneQueryCache: The active cache.
+    """
+    global _QUERY_CACHE
+    cache = SceneQueryCache()
+    cache.start()
+    previous_cache, _QUERY_CACHE = _QUERY_CACHE, cache
+    try:
+        yield cache
+    finally:
+        _QUERY_CACHE = previous_cache
+        stats = cache.stats()
+        cache.stop()
+        SCENE_LOGGER.info("Scene query cache: %d hits, %d misses "
+                          "(%.0f%% hit rate)", stats["hits"], stats["misses"],
+                          stats["hit_rate"] * 100)
+
+
+def query_exists(node):
+    """Cached cmds.objExists."""
+    if _QUERY_CACHE is None:
+        return cmds.objExists(node)
+    return _QUERY_CACHE.get(("exists", node), node,
+                            lambda: cmds.objExists(node))
+
+
+def query_node_type(node):
+    """Cached cmds.nodeType."""
+    if _QUERY_CACHE is None:
+        return cmds.nodeType(node)
+    return _QUERY_CACHE.get(("nodeType", node), node,
+                            lambda: cmds.nodeType(node))
+
+
+def query_shapes(node, no_intermediate=False):
+    """Cached cmds.listRelatives(shapes=True, fullPath=True), never None."""
+    def compute():
+        return cmds.listRelatives(node, shapes=True, fullPath=True,
+                                  noIntermediate=no_intermediate) or []
+
+    if _QUERY_CACHE is None:
+        return compute()
+    return list(_QUERY_CACHE.get(("shapes", node, no_intermediate), node,
+                                 compute))
+
+
+def query_has_attribute(node, attribute):
+    """Cached cmds.attributeQuery(exists=True)."""
+    def compute():
+        return cmds.attributeQuery(attribute, node=node, exists=True)
+
+    if _QUERY_CACHE is None:
+        return compute()
+    return _QUERY_CACHE.get(("attributeExists", node, attribute), node,
+                            compute, watch_attributes=True)
 
 
 def import_alembic(file_path, namespace="temp"):
@@ -58,6 +760,7 @@ def import_alembic(file_path, namespace="temp"):
 
     :param file_path: The full path to the Alembic file.
     :param namespace: (Optional) Namespace for the imported objects.
+    :return: The names of the imported nodes.
     """
     # Check if the Alembic plugin is loaded
     if not cmds.pluginInfo("AbcImport", query=True, loaded=True):
@@ -74,8 +777,11 @@ def import_alembic(file_path, namespace="temp"):
 
     try:
         # Import the Alembic file
-        cmds.AbcImport(file_path, mode="import")
-        print(f"Successfully imported Alembic file: {file_path}")
+        with collect_new_nodes() as new_nodes:
+            cmds.AbcImport(file_path, mode="import")
+        IMPORT_LOGGER.info("Successfully imported Alembic file: %s",
+                           file_path)
+        return new_nodes
     except Exception as e:
         cmds.error(f"Failed to import Alembic file: {file_path}\n{str(e)}")
 
@@ -86,6 +792,7 @@ def import_ma(file_path, namespace=":"):
 
     :param file_path: The full path to the Maya ASCII file.
     :param namespace: (Optional) Namespace for the imported objects.
+    :return: The names of the imported nodes.
     """
     # Check if the provided file path exists
     if not os.path.exists(file_path):
@@ -99,214 +806,969 @@ def import_ma(file_path, namespace=":"):
                 cmds.namespace(add=namespace)
 
         # Import the .ma file
-        cmds.file(file_path, i=True, namespace=namespace)
-        print(f"Successfully imported Maya ASCII file: {file_path}")
+        new_nodes = cmds.file(file_path, i=True, namespace=namespace,
+                              returnNewNodes=True) or []
+        IMPORT_LOGGER.info("Successfully imported Maya ASCII file: %s",
+                           file_path)
+        return new_nodes
     except Exception as e:
         cmds.error(f"Failed to import Maya ASCII file: {file_path}\n{str(e)}")
 
 
-def get_shotgrid_context():
-    """Retrieve the ShotGrid context of the currently open scene in Maya."""
-    # Get the context using the SGTK API
-    try:
-        engine = sgtk.platform.current_engine()
-        context = engine.context
-        return context
-    except Exception as e:
-        print(f"Error retrieving ShotGrid context: {e}")
-        return None
-
-
-def query_asset_id_from_task():
-    """Query the asset ID associated with the current task in Maya."""
-    # Get ShotGrid context
-    context = get_shotgrid_context()
-    if not context:
-        print("Failed to retrieve ShotGrid context.")
-        return None
+# Tags stripped from published file names to find the LOD-less representation
+LOD_TAGS = ("_LO", "_MI", "_HI")
 
-    # Check if the context has a task
-    if not context.task:
-        print("No task found in the current context.")
-        return None
+# Directory -> (mtime, index) cache filled by get_publish_index
+_PUBLISH_INDEX_CACHE = {}
 
-    task_id = context.task["id"]
-    print(f"Current Task ID: {task_id}")
 
-    # Query the associated asset ID
-    try:
-        task = sg.find_one("Task", [["id", "is", task_id]], ["entity"])
-        if task and task["entity"] and task["entity"]["type"] == "Asset":
-            asset_id = task["entity"]["id"]
-            print(f"Associated Asset ID: {asset_id}")
-            return asset_id
-        else:
-            print("No associated asset found for the current task.")
-            return None
-    except Exception as e:
-        print(f"Error querying asset ID: {e}")
-        return None
+def split_lod_tag(file_name):
+    """
+    Split a published file name into its representation key, LOD and
+    extension.
 
+    Args:
+        file_name (str): Base name of a published file.
 
-def import_alembic_and_select_roots(file_path, namespace="temp"):  # TODELETE
+    Returns:
+        tuple: (key, lod, extension). lod is None when the name carries no
+               LOD tag, extension is lower case.
     """
-    Import an Alembic (.abc) file into the Maya scene and select its root nodes
+    stem, extension = os.path.splitext(file_name)
+    lod = None
+    for tag in LOD_TAGS:
+        if tag in stem:
+            lod = lod or tag[1:]
+            stem = stem.replace(tag, "")
+    return stem, lod, extension.lower()
 
-    :param file_path: The full path to the Alembic file.
-    :param namespace: (Optional) Namespace for the imported objects.
-    """
-    # Check if the Alembic plugin is loaded
-    if not cmds.pluginInfo("AbcImport", query=True, loaded=True):
-        try:
-            cmds.loadPlugin("AbcImport")
-        except RuntimeError:
-            cmds.error("Failed to load AbcImport plugin.")
-            return
 
-    # List of scene nodes before import
-    nodes_before = cmds.ls(dag=True, long=True)
+def build_publish_index(directory):
+    """
+    List a publish directory once and index its files per asset and LOD.
 
-    try:
-        # Import the Alembic file
-        cmds.AbcImport(file_path, mode="import", connect=False)
-        print(f"Successfully imported Alembic file: {file_path}")
-    except Exception as e:
-        cmds.error(f"Failed to import Alembic file: {file_path}\n{str(e)}")
-        return
+    Args:
+        directory (str): The publish directory to scan.
 
-    # List of scene nodes after import
-    nodes_after = cmds.ls(dag=True, long=True)
+    Returns:
+        dict: {key: {lod: {extension: path}}} for every file of the directory.
+    """
+    index = {}
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if not entry.is_file():
+                continue
+            key, lod, extension = split_lod_tag(entry.name)
+            index.setdefault(key, {}).setdefault(lod, {})[extension] = \
+                entry.path
+    return index
+
+
+def get_publish_index(directory):
+    """
+    Return the publish index of a directory, rebuilding it only when the
+    directory modification time changed since the last scan.
 
-    # Identify new root nodes (nodes that were added by the import)
-    imported_nodes = set(nodes_after) - set(nodes_before)
-    root_nodes = [
-        node for node in imported_nodes if cmds.listRelatives(
-            node, parent=True) is None
-    ]
+    Args:
+        directory (str): The publish directory.
 
-    # Apply namespace, if provided
-    if namespace:
-        for root in root_nodes:
-            new_name = f"{namespace}:{root}"
-            cmds.rename(root, new_name)
+    Returns:
+        dict: The index built by build_publish_index.
+    """
+    directory = os.path.normcase(os.path.abspath(directory))
+    mtime = os.stat(directory).st_mtime_ns
+    cached = _PUBLISH_INDEX_CACHE.get(directory)
+    if cached and cached[0] == mtime:
+        return cached[1]
 
-    # Select the root nodes
-    if root_nodes:
-        cmds.select(root_nodes, replace=True)
-        print(f"Selected root nodes: {root_nodes}")
-    else:
-        print("No root nodes found from Alembic import.")
+    index = build_publish_index(directory)
+    _PUBLISH_INDEX_CACHE[directory] = (mtime, index)
+    return index
 
 
-def get_last_published_alembic(asset_id):
+def resolve_publish_sibling(file_path, extension=".ma", lod=None):
     """
-    Retrieve the last 'PublishedFile' of type 'Alembic Cache' from the UV task
-    of a given asset.
+    Resolve the file published next to file_path with the given extension.
+
+    Candidates are tried in a fixed order: the requested LOD, the LOD-less
+    representation, then the LOD of file_path itself.
 
     Args:
-        asset_id (int): The ID of the asset in ShotGrid.
+        file_path (str): Path of a published file (usually the Alembic cache).
+        extension (str): Extension of the wanted representation.
+        lod (str): (Optional) LOD to look for first ("LO", "MI" or "HI").
 
     Returns:
-        dict: The latest PublishedFile record, or None if not found.
+        str: Path of the sibling file, or None if it was not published.
     """
-    # Connect to ShotGrid
-
+    directory, file_name = os.path.split(file_path)
+    key, source_lod, _ = split_lod_tag(file_name)
     try:
-        # Find the UV Task associated with the asset
-        uv_task = sg.find_one(
-            "Task",
-            [["entity.Asset.id", "is", asset_id], ["content", "is", "UV"]],
-            ["id", "content"],
-        )
-
-        if not uv_task:
-            print(f"No UV task found for Asset ID {asset_id}.")
-            return None
+        representations = get_publish_index(directory or ".").get(key, {})
+    except OSError as e:
+        IMPORT_LOGGER.warning("Cannot list publish directory '%s': %s",
+                              directory, e)
+        return None
 
-        print(f"Found UV Task: {uv_task}")
-
-        # Query PublishedFiles for the UV task
-        # filtered by type "Alembic Cache"
-        published_files = sg.find(
-            "PublishedFile",
-            [
-                ["task.Task.id", "is", uv_task["id"]],
-                ["published_file_type.PublishedFileType.code",
-                 "is", "Alembic Cache"],
-            ],
-            ["id", "code", "created_at", "path"],
-        )
+    for candidate in (lod, None, source_lod):
+        path = representations.get(candidate, {}).get(extension.lower())
+        if path:
+            return path
+    return None
 
-        if not published_files:
-            print(
-                "No 'Alembic Cache' PublishedFiles found"
-                f" for UV Task ID {uv_task['id']}."
-            )
-            return None
 
-        # Sort the results by created_at to get the latest file
-        latest_published_file = sorted(
-            published_files, key=lambda x: x["created_at"], reverse=True
-        )[0]
-        print(f"Latest 'Alembic Cache' PublishedFile: {latest_published_file}")
-        return latest_published_file
+# Formats imported by import_best_representation, fastest-loading first
+REPRESENTATION_PRIORITY = (".mb", ".ma", ".abc")
 
-    except Exception as e:
-        print(f"Error querying PublishedFiles: {e}")
-        return None
+# Extension -> list of (seconds, bytes) measured by import_best_representation
+IMPORT_TIMINGS = {}
 
 
-def select_nodes_in_namespace(namespace: str = "TEMP"):
+def reference_file(file_path, namespace="geo", deferred=False):
     """
-    Select all nodes belonging to a given namespace.
+    Reference a published file into the Maya scene instead of importing it.
 
-    :param namespace: The namespace to search for nodes.
+    :param file_path: The full path to the .mb, .ma or .abc file.
+    :param namespace: Namespace given to the referenced nodes.
+    :param deferred: Create the reference unloaded, load_reference must then
+    be called before binding.
+    :return: The name of the created reference node.
     """
-    if not namespace:
-        cmds.error("Please provide a valid namespace.")
+    if not os.path.exists(file_path):
+        cmds.error(f"File does not exist: {file_path}")
         return
 
-    # List all nodes in the namespace
-    nodes_in_namespace = cmds.ls(f"{namespace}:*", long=True)
-
-    if not nodes_in_namespace:
-        cmds.warning(f"No nodes found in namespace: {namespace}")
-        return
+    try:
+        reference_path = cmds.file(file_path, reference=True,
+                                   namespace=namespace,
+                                   deferReference=deferred)
+        reference_node = cmds.referenceQuery(reference_path,
+                                             referenceNode=True)
+        IMPORT_LOGGER.info("Successfully referenced file: %s", file_path)
+        return reference_node
+    except Exception as e:
+        cmds.error(f"Failed to reference file: {file_path}\n{str(e)}")
 
-    # Select all nodes in the namespace
-    cmds.select(nodes_in_namespace, replace=True)
-    print(f"Selected nodes in namespace '{namespace}': {nodes_in_namespace}")
 
+def load_reference(reference_node):
+    """
+    Load a reference created with deferred loading.
 
-def create_and_set_namespace(namespace_name="TEMP"):
+    :param reference_node: The name of the reference node to load.
     """
-    Create a namespace and set it as the current namespace in Maya.
-    If the namespace already exists, it will simply set it as the current one.
+    if not cmds.referenceQuery(reference_node, isLoaded=True):
+        cmds.file(loadReference=reference_node)
+        IMPORT_LOGGER.info("Loaded reference '%s'.", reference_node)
 
-    :param namespace_name: The name of the namespace to create and set
-    (default is 'TEMP').
+
+def get_publish_representations(file_path):
     """
-    # Check if the namespace already exists
-    if not cmds.namespace(exists=namespace_name):
-        # Create the namespace if it doesn't exist
-        cmds.namespace(add=namespace_name)
-        print(f"Namespace '{namespace_name}' created.")
-    else:
-        print(f"Namespace '{namespace_name}' already exists.")
+    List the importable representations published for a file.
 
-    # Set the current namespace
-    cmds.namespace(set=namespace_name)
-    print(f"Current namespace set to: {namespace_name}")
+    Args:
+        file_path (str): Path of a published file (usually the Alembic cache).
+
+    Returns:
+        dict: {extension: path} for each format of REPRESENTATION_PRIORITY
+              found next to file_path.
+    """
+    representations = {}
+    for extension in REPRESENTATION_PRIORITY:
+        path = resolve_publish_sibling(file_path, extension)
+        if path:
+            representations[extension] = path
+    return representations
 
 
-def delete_namespace(namespace_name=":TEMP", move_nodes_to_root=True):
+def get_publish_lods(file_path):
     """
-    Delete a namespace in Maya and set the namespace back to the root
-    namespace.
+    List the LODs published next to a file and their representations.
 
-    :param namespace_name: The name of the namespace to delete
-    (default is 'TEMP').
-    :param move_nodes_to_root: Whether to move nodes to the root namespace
+    Args:
+        file_path (str): Path of a published file (usually the Alembic cache).
+
+    Returns:
+        dict: {lod: {extension: path}} in LOD_TAGS order, only the LOD tagged
+              files with a format of REPRESENTATION_PRIORITY are listed.
+    """
+    directory, file_name = os.path.split(file_path)
+    key = split_lod_tag(file_name)[0]
+    try:
+        index = get_publish_index(directory or ".").get(key, {})
+    except OSError as e:
+        IMPORT_LOGGER.warning("Cannot list publish directory '%s': %s",
+                              directory, e)
+        return {}
+
+    lods = {}
+    for tag in LOD_TAGS:
+        representations = {
+            extension: path
+            for extension, path in index.get(tag[1:], {}).items()
+            if extension in REPRESENTATION_PRIORITY}
+        if representations:
+            lods[tag[1:]] = representations
+    return lods
+
+
+def get_source_lod(file_path, lods):
+    """
+    Pick the LOD bound by a multi-LOD run, its weights are transferred to
+    the others: the LOD of the publish itself, or the most detailed one.
+
+    Args:
+        file_path (str): Path of the published file.
+        lods (dict): The LODs returned by get_publish_lods.
+
+    Returns:
+        str: The source LOD, None when no LOD was published.
+    """
+    lod = split_lod_tag(os.path.basename(file_path))[1]
+    if lod in lods:
+        return lod
+    for tag in reversed(LOD_TAGS):
+        if tag[1:] in lods:
+            return tag[1:]
+    return None
+
+
+def get_average_load_cost(extension):
+    """
+    Return the measured import cost of a format in seconds per byte.
+
+    Args:
+        extension (str): The file extension, e.g. ".mb".
+
+    Returns:
+        float: The average cost, or None if the format was never imported.
+    """
+    timings = IMPORT_TIMINGS.get(extension)
+    if not timings:
+        return None
+    seconds = sum(elapsed for elapsed, _ in timings)
+    size = sum(file_size for _, file_size in timings)
+    return seconds / max(size, 1)
+
+
+def rank_representations(extensions):
+    """
+    Order formats from the cheapest to the most expensive to load.
+
+    Measured costs are used once every candidate has been timed, until then
+    the static REPRESENTATION_PRIORITY order applies.
+
+    Args:
+        extensions (list): Extensions to rank.
+
+    Returns:
+        list: The extensions, cheapest first.
+    """
+    costs = {extension: get_average_load_cost(extension)
+             for extension in extensions}
+    if None in costs.values():
+        return sorted(extensions, key=REPRESENTATION_PRIORITY.index)
+    return sorted(extensions, key=lambda extension: (
+        costs[extension], REPRESENTATION_PRIORITY.index(extension)))
+
+
+@contextlib.contextmanager
+def current_namespace(namespace):
+    """
+    Create the new nodes in a namespace while the context is active, for
+    importers without a namespace option (AbcImport).
+
+    Args:
+        namespace (str): The namespace, created under the root if needed.
+    """
+    if not cmds.namespace(exists=":" + namespace):
+        cmds.namespace(add=namespace, parent=":")
+    previous = cmds.namespaceInfo(currentNamespace=True, absoluteName=True)
+    cmds.namespace(setNamespace=":" + namespace)
+    try:
+        yield
+    finally:
+        cmds.namespace(setNamespace=previous)
+
+
+def import_representation(file_path, reference=False, namespace="geo",
+                          import_namespace=None):
+    """
+    Import a published file with the importer matching its extension, or
+    reference it.
+
+    :param file_path: The full path to the .mb, .ma or .abc file.
+    :param reference: Reference the file instead of importing it.
+    :param namespace: Namespace of the reference, ignored on import.
+    :param import_namespace: (Optional) Namespace of the imported nodes, the
+                             root namespace by default.
+    :return: The names of the new nodes.
+    """
+    if reference:
+        if file_path.lower().endswith(".abc") and \
+                not cmds.pluginInfo("AbcImport", query=True, loaded=True):
+            cmds.loadPlugin("AbcImport")
+        reference_node = reference_file(file_path, namespace=namespace)
+        return cmds.referenceQuery(reference_node, nodes=True,
+                                   dagPath=True) or []
+    elif file_path.lower().endswith(".abc"):
+        if import_namespace:
+            with current_namespace(import_namespace):
+                return import_alembic(file_path)
+        return import_alembic(file_path)
+    else:
+        return import_ma(file_path, import_namespace or ":")
+
+
+def discard_nodes(nodes):
+    """
+    Delete the nodes left by a failed import, removing references through
+    their reference node.
+
+    Args:
+        nodes (list): The names of the nodes, some may already be gone.
+    """
+    nodes = [node for node in nodes if cmds.objExists(node)]
+    for node in cmds.ls(nodes, type="reference"):
+        try:
+            cmds.file(referenceNode=node, removeReference=True)
+        except RuntimeError:
+            cmds.lockNode(node, lock=False)
+    nodes = [node for node in nodes if cmds.objExists(node) and
+             not cmds.referenceQuery(node, isNodeReferenced=True)]
+    if nodes:
+        cmds.delete(nodes)
+
+
+def import_best_representation(file_path, reference=False, namespace="geo",
+                               representations=None, import_namespace=None):
+    """
+    Import (or reference) the fastest-loading representation published for a
+    file, falling back to the next format when it fails.
+
+    Args:
+        file_path (str): Path of a published file (usually the Alembic cache).
+        reference (bool): Reference the representation instead of importing
+                          it.
+        namespace (str): Namespace of the reference, ignored on import.
+        representations (dict): (Optional) {extension: path} to choose from,
+                                the siblings of file_path by default.
+        import_namespace (str): (Optional) Namespace of the imported nodes,
+                                the root namespace by default.
+
+    Returns:
+        tuple: (path, new_nodes) the path of the loaded file and the names of
+               the nodes it created.
+    """
+    if representations is None:
+        representations = get_publish_representations(file_path)
+    for extension in rank_representations(list(representations)):
+        path = representations[extension]
+        start = time.perf_counter()
+        try:
+            with collect_new_nodes() as attempt_nodes:
+                new_nodes = import_representation(path, reference, namespace,
+                                                  import_namespace)
+        except RuntimeError as e:
+            IMPORT_LOGGER.warning("Failed to load '%s', trying next format: "
+                                  "%s", path, e)
+            # Don't let the next format import on top of a partial load
+            discard_nodes(attempt_nodes)
+            continue
+
+        elapsed = time.perf_counter() - start
+        IMPORT_TIMINGS.setdefault(extension, []).append(
+            (elapsed, os.path.getsize(path)))
+        IMPORT_LOGGER.info("Imported %s representation in %.2fs",
+                           extension, elapsed)
+        return path, new_nodes
+
+    cmds.error(f"No representation of '{file_path}' could be imported.")
+
+
+def get_shotgrid_context():
+    """Retrieve the ShotGrid context of the currently open scene in Maya."""
+    # Get the context using the SGTK API
+    try:
+        engine = sgtk.platform.current_engine()
+        context = engine.context
+        return context
+    except Exception as e:
+        SHOTGRID_LOGGER.error("Error retrieving ShotGrid context: %s", e)
+        return None
+
+
+def query_asset_id_from_task(job=None):
+    """
+    Query the asset ID associated with the current task in Maya.
+
+    Args:
+        job (RigJob): (Optional) The rig job, the default one otherwise.
+    """
+    job = job or get_default_rig_job()
+    # Get ShotGrid context
+    context = get_shotgrid_context()
+    if not context:
+        SHOTGRID_LOGGER.error("Failed to retrieve ShotGrid context.")
+        return None
+
+    # Check if the context has a task
+    if not context.task:
+        SHOTGRID_LOGGER.error("No task found in the current context.")
+        return None
+
+    task_id = context.task["id"]
+    SHOTGRID_LOGGER.debug("Current Task ID: %s", task_id)
+
+    # Query the associated asset ID
+    try:
+        task = job.shotgun.find_one(
+            "Task", [["id", "is", task_id]], ["entity"])
+        if task and task["entity"] and task["entity"]["type"] == "Asset":
+            asset_id = task["entity"]["id"]
+            SHOTGRID_LOGGER.debug("Associated Asset ID: %s", asset_id)
+            return asset_id
+        else:
+            SHOTGRID_LOGGER.error(
+                "No associated asset found for the current task.")
+            return None
+    except Exception as e:
+        SHOTGRID_LOGGER.error("Error querying asset ID: %s", e)
+        return None
+
+
+def import_alembic_and_select_roots(file_path, namespace="temp",
+                                    select=True):  # TODELETE
+    """
+    Import an Alembic (.abc) file into the Maya scene and select its root nodes
+
+    :param file_path: The full path to the Alembic file.
+    :param namespace: (Optional) Namespace for the imported objects.
+    :param select: Select the root nodes, leave the selection untouched
+    otherwise.
+    :return: The imported root nodes.
+    """
+    # Check if the Alembic plugin is loaded
+    if not cmds.pluginInfo("AbcImport", query=True, loaded=True):
+        try:
+            cmds.loadPlugin("AbcImport")
+        except RuntimeError:
+            cmds.error("Failed to load AbcImport plugin.")
+            return
+
+    try:
+        # Import the Alembic file, keeping track of the created nodes
+        with collect_new_nodes() as imported_nodes:
+            cmds.AbcImport(file_path, mode="import", connect=False)
+        IMPORT_LOGGER.info("Successfully imported Alembic file: %s",
+                           file_path)
+    except Exception as e:
+        cmds.error(f"Failed to import Alembic file: {file_path}\n{str(e)}")
+        return
+
+    # Identify new root nodes (world children among the imported nodes)
+    root_nodes = [
+        node for node in imported_nodes
+        if node.startswith("|") and node.count("|") == 1
+    ]
+
+    # Apply namespace, if provided
+    if namespace:
+        root_nodes = [
+            cmds.rename(root, f"{namespace}:{root.lstrip('|')}")
+            for root in root_nodes
+        ]
+
+    # Select the root nodes
+    if root_nodes and select:
+        cmds.select(root_nodes, replace=True)
+        IMPORT_LOGGER.info("Selected %d root nodes.", len(root_nodes))
+    elif root_nodes:
+        IMPORT_LOGGER.info("Imported %d root nodes.", len(root_nodes))
+    else:
+        IMPORT_LOGGER.warning("No root nodes found from Alembic import.")
+    return root_nodes
+
+
+def find_uv_task(asset_id, job=None):
+    """
+    Find the UV Task of an asset.
+
+    Args:
+        asset_id (int): The ID of the asset in ShotGrid.
+        job (RigJob): (Optional) The rig job, the default one otherwise.
+
+    Returns:
+        dict: The Task record, or None if the asset has no UV task.
+    """
+    job = job or get_default_rig_job()
+    return job.shotgun.find_one(
+        "Task", job.task_filters(asset_id, "UV"), ["id", "content"])
+
+
+def find_latest_alembic_publish(task_id, job=None):
+    """
+    Find the latest 'Alembic Cache' PublishedFile of a task.
+
+    Args:
+        task_id (int): The ID of the task in ShotGrid.
+        job (RigJob): (Optional) The rig job, the default one otherwise.
+
+    Returns:
+        dict: The latest PublishedFile record, or None if not found.
+    """
+    job = job or get_default_rig_job()
+    # Query PublishedFiles for the task filtered by type "Alembic Cache"
+    published_files = job.shotgun.find(
+        "PublishedFile",
+        [
+            ["task.Task.id", "is", task_id],
+            ["published_file_type.PublishedFileType.code",
+             "is", "Alembic Cache"],
+        ],
+        ["id", "code", "created_at", "path"],
+    )
+    if not published_files:
+        return None
+
+    # Sort the results by created_at to get the latest file
+    return sorted(
+        published_files, key=lambda x: x["created_at"], reverse=True
+    )[0]
+
+
+def get_last_published_alembic(asset_id, job=None):
+    """
+    Retrieve the last 'PublishedFile' of type 'Alembic Cache' from the UV task
+    of a given asset.
+
+    Args:
+        asset_id (int): The ID of the asset in ShotGrid.
+        job (RigJob): (Optional) The rig job, the default one otherwise.
+
+    Returns:
+        dict: The latest PublishedFile record, or None if not found.
+    """
+    try:
+        # Find the UV Task associated with the asset
+        uv_task = find_uv_task(asset_id, job)
+
+        if not uv_task:
+            SHOTGRID_LOGGER.error("No UV task found for Asset ID %s.",
+                                  asset_id)
+            return None
+
+        SHOTGRID_LOGGER.debug("Found UV Task: %s", uv_task)
+
+        latest_published_file = find_latest_alembic_publish(
+            uv_task["id"], job)
+        if not latest_published_file:
+            SHOTGRID_LOGGER.error(
+                "No 'Alembic Cache' PublishedFiles found"
+                " for UV Task ID %s.", uv_task["id"]
+            )
+            return None
+
+        SHOTGRID_LOGGER.debug("Latest 'Alembic Cache' PublishedFile: %s",
+                              latest_published_file)
+        return latest_published_file
+
+    except Exception as e:
+        SHOTGRID_LOGGER.error("Error querying PublishedFiles: %s", e)
+        return None
+
+
+def get_publish_local_path(published_file):
+    """
+    Returns the Windows local path of a PublishedFile record.
+
+    Args:
+        published_file (dict): The PublishedFile record.
+
+    Returns:
+        str: The local path, or None if the record has none.
+    """
+    path = (published_file or {}).get("path") or {}
+    return path.get("local_path_windows")
+
+
+def get_asset_name_from_code(code):
+    """
+    Extract the asset name from a PublishedFile code
+    ("<prefix>_<asset>_...").
+
+    Args:
+        code (str): The PublishedFile code.
+
+    Returns:
+        str: The asset name.
+    """
+    parts = str(code).split("_")
+    if len(parts) < 2 or not parts[1]:
+        raise ValueError(f"Cannot read an asset name from code '{code}'.")
+    return parts[1]
+
+
+# Statements of a Maya ASCII file counted by scan_maya_ascii: created node
+# types, and the sizes of the vertex, edge and face arrays of the meshes
+MAYA_ASCII_SCAN_PATTERN = re.compile(
+    rb'^[ \t]*(?:createNode[ \t]+(\w+)'
+    rb'|setAttr[ \t]+-s[ \t]+(\d+)(?:[ \t]+-ch[ \t]+\d+)?[ \t]+'
+    rb'"\.(vt|ed|fc)(?=[\["]))', re.M)
+
+# Rough cost model of a rig job, to tune against the durations and memory
+# peaks recorded by the job queue
+RIG_COST_BASE_SECONDS = 5.0
+RIG_COST_SECONDS_PER_MESH = 0.05
+RIG_COST_SECONDS_PER_VERTEX = 2e-5
+RIG_MEMORY_BASE_MB = 1500.0
+RIG_MEMORY_MB_PER_VERTEX = 1e-3
+
+# Vertices per byte assumed for publishes that cannot be scanned (.mb, .abc)
+BINARY_VERTICES_PER_BYTE = 1.0 / 40
+
+
+def scan_maya_ascii(file_path):
+    """
+    Count the nodes and mesh components of a Maya ASCII file without Maya.
+    The file is memory-mapped and matched in one pass, so large publishes
+    are never loaded in memory.
+
+    Args:
+        file_path (str): The Maya ASCII file.
+
+    Returns:
+        dict: meshes, transforms, vertices, edges and faces counts.
+    """
+    counts = {"meshes": 0, "transforms": 0, "vertices": 0, "edges": 0,
+              "faces": 0}
+    components = {b"vt": "vertices", b"ed": "edges", b"fc": "faces"}
+    if not os.path.getsize(file_path):
+        return counts
+
+    with open(file_path, "rb") as maya_file, \
+            mmap.mmap(maya_file.fileno(), 0,
+                      access=mmap.ACCESS_READ) as data:
+        for match in MAYA_ASCII_SCAN_PATTERN.finditer(data):
+            node_type, size, component = match.groups()
+            if node_type == b"mesh":
+                counts["meshes"] += 1
+            elif node_type == b"transform":
+                counts["transforms"] += 1
+            elif component:
+                counts[components[component]] += int(size)
+    return counts
+
+
+def estimate_rig_cost(representations, sidecar=None):
+    """
+    Estimate the duration and memory of a rig job from its geometry
+    publish: the counts of its sidecar when there is one, otherwise
+    scanning the Maya ASCII representation when there is one.
+
+    Args:
+        representations (dict): {extension: path} of the publish (see
+                                get_publish_representations).
+        sidecar (dict): (Optional) The publish sidecar (see
+                        read_publish_sidecar).
+
+    Returns:
+        dict: seconds, memory_mb, and the scanned counts (meshes,
+              vertices...), "scanned" is False when they were guessed from
+              the file size.
+    """
+    if sidecar:
+        cost = {"meshes": sidecar["mesh_count"],
+                "vertices": sidecar["vertex_count"], "scanned": True}
+    elif ".ma" in representations:
+        cost = scan_maya_ascii(representations[".ma"])
+        cost["scanned"] = True
+    else:
+        path = next(iter(representations.values()))
+        cost = {"meshes": 0, "vertices": int(
+            os.path.getsize(path) * BINARY_VERTICES_PER_BYTE),
+            "scanned": False}
+
+    cost["seconds"] = (RIG_COST_BASE_SECONDS
+                       + RIG_COST_SECONDS_PER_MESH * cost["meshes"]
+                       + RIG_COST_SECONDS_PER_VERTEX * cost["vertices"])
+    cost["memory_mb"] = (RIG_MEMORY_BASE_MB
+                         + RIG_MEMORY_MB_PER_VERTEX * cost["vertices"])
+    return cost
+
+
+# Suffix of the metadata written next to a geometry publish
+SIDECAR_SUFFIX = ".rig.json"
+SIDECAR_VERSION = 2
+
+
+def get_sidecar_path(file_path):
+    """
+    Returns:
+        str: Path of the sidecar shared by the representations of a
+             publish (<publish>.rig.json).
+    """
+    return os.path.splitext(file_path)[0] + SIDECAR_SUFFIX
+
+
+# Bytes hashed at each end of a publish file by get_file_stamp
+FILE_STAMP_SAMPLE_SIZE = 1 << 16
+
+
+def get_file_stamp(file_path):
+    """
+    Stamp a file by its content rather than its mtime, which copies and
+    syncs between shares don't keep. Only the size and both ends of the
+    file are hashed: an edit of the same size leaving the first and last
+    FILE_STAMP_SAMPLE_SIZE bytes untouched goes unnoticed, rewritten
+    Alembic and Maya files change their header or their tail.
+
+    Returns:
+        list: [size, sha1 of the sampled bytes] of the file.
+    """
+    size = os.path.getsize(file_path)
+    digest = hashlib.sha1()
+    with open(file_path, "rb") as stamped_file:
+        digest.update(stamped_file.read(FILE_STAMP_SAMPLE_SIZE))
+        if size > FILE_STAMP_SAMPLE_SIZE:
+            stamped_file.seek(max(FILE_STAMP_SAMPLE_SIZE,
+                                  size - FILE_STAMP_SAMPLE_SIZE))
+            digest.update(stamped_file.read())
+    return [size, digest.hexdigest()]
+
+
+def write_publish_sidecar(file_path, meshes=None):
+    """
+    Write the geometry metadata the rig stage needs next to a publish: world
+    bounds, mesh and vertex counts. Meant to run in the UV publish
+    session, once the representations are written.
+
+    Args:
+        file_path (str): Path of the published file.
+        meshes (list): (Optional) The published meshes, every mesh of the
+                       scene by default.
+
+    Returns:
+        str: Path of the sidecar.
+    """
+    if meshes is None:
+        meshes = get_all_geo_from_scene()
+    meshes = [mesh for mesh in meshes if is_mesh(mesh)]
+    if not meshes:
+        cmds.error("No mesh to describe in the publish sidecar.")
+        return
+
+    sidecar = {
+        "version": SIDECAR_VERSION,
+        "bounds": cmds.exactWorldBoundingBox(meshes),
+        "mesh_count": len(meshes),
+        "vertex_count": sum(cmds.polyEvaluate(mesh, vertex=True)
+                            for mesh in meshes),
+        # Publish files the metadata describes, to detect a stale sidecar
+        "files": {os.path.basename(path): get_file_stamp(path)
+                  for path in get_publish_representations(file_path).values()},
+    }
+    sidecar_path = get_sidecar_path(file_path)
+    with open(sidecar_path, "w") as sidecar_file:
+        json.dump(sidecar, sidecar_file, indent=4)
+    IMPORT_LOGGER.info("Publish sidecar written: %s", sidecar_path)
+    return sidecar_path
+
+
+def read_publish_sidecar(file_path):
+    """
+    Read the sidecar of a publish, without Maya.
+
+    Args:
+        file_path (str): Path of the published file.
+
+    Returns:
+        dict: The sidecar (bounds, mesh_count, vertex_count), None when it
+              is missing, unreadable or older than the publish files.
+    """
+    sidecar_path = get_sidecar_path(file_path)
+    if not os.path.exists(sidecar_path):
+        return None
+    try:
+        with open(sidecar_path) as sidecar_file:
+            sidecar = json.load(sidecar_file)
+        if sidecar.get("version") != SIDECAR_VERSION:
+            raise ValueError(f"unsupported version {sidecar.get('version')}")
+        directory = os.path.dirname(sidecar_path)
+        for name, stamp in sidecar["files"].items():
+            if get_file_stamp(os.path.join(directory, name)) != stamp:
+                raise ValueError(f"'{name}' changed since it was written")
+    except (OSError, ValueError, KeyError) as e:
+        IMPORT_LOGGER.info("Ignoring publish sidecar '%s': %s", sidecar_path,
+                           e)
+        return None
+    return sidecar
+
+
+def plan_asset(asset_id, job=None):
+    """
+    Resolve everything auto_rig_prop needs for an asset, without Maya.
+
+    Args:
+        asset_id (int): The ID of the asset in ShotGrid.
+        job (RigJob): (Optional) The rig job, the default one otherwise.
+
+    Returns:
+        dict: The job plan (asset_id, asset_name, publish_path,
+              representations, lods, cost, and the publish sidecar, None
+              when there is no valid one).
+
+    Raises:
+        RuntimeError: With the reason the asset cannot be rigged.
+    """
+    uv_task = find_uv_task(asset_id, job)
+    if not uv_task:
+        raise RuntimeError("No UV task.")
+
+    latest_file = find_latest_alembic_publish(uv_task["id"], job)
+    if not latest_file:
+        raise RuntimeError(
+            f"No 'Alembic Cache' publish on UV task {uv_task['id']}.")
+
+    publish_path = get_publish_local_path(latest_file)
+    if not publish_path:
+        raise RuntimeError(
+            f"PublishedFile {latest_file['id']} has no local Windows path.")
+
+    try:
+        asset_name = get_asset_name_from_code(latest_file["code"])
+    except ValueError as e:
+        raise RuntimeError(str(e))
+
+    representations = get_publish_representations(publish_path)
+    if not representations:
+        raise RuntimeError(f"Nothing importable published next to "
+                           f"{publish_path}.")
+    sidecar = read_publish_sidecar(publish_path)
+
+    return {
+        "asset_id": asset_id,
+        "asset_name": asset_name,
+        "published_file_id": latest_file["id"],
+        "publish_path": publish_path,
+        "representations": representations,
+        "lods": get_publish_lods(publish_path),
+        "cost": estimate_rig_cost(representations, sidecar),
+        "sidecar": sidecar,
+    }
+
+
+def plan_auto_rig(asset_ids, max_workers=8, job=None,
+                  shotgun_factory=create_shotgun_connection):
+    """
+    Dry-run auto_rig_prop for many assets at once: ShotGrid resolution, path
+    derivation and file checks run concurrently, nothing touches a scene and
+    Maya is not needed.
+
+    Args:
+        asset_ids (list): IDs of the assets to plan.
+        max_workers (int): Number of concurrent lookups.
+        job (RigJob): (Optional) Project and template of the assets, each
+                      worker thread runs a clone of it.
+        shotgun_factory (callable): Creates the ShotGrid connection of each
+                                    worker thread.
+
+    Returns:
+        tuple: (plans, failures) the plans of the assets that can be rigged,
+               and {"asset_id", "reason"} records for the others, both in
+               the order of asset_ids.
+    """
+    job = job or RigJob()
+    thread_jobs = threading.local()
+
+    def plan(asset_id):
+        if not hasattr(thread_jobs, "job"):
+            thread_jobs.job = job.clone(shotgun=shotgun_factory())
+        return plan_asset(asset_id, thread_jobs.job)
+
+    plans = []
+    failures = []
+    with concurrent.futures.ThreadPoolExecutor(max_workers) as executor:
+        futures = [executor.submit(plan, asset_id) for asset_id in asset_ids]
+        for asset_id, future in zip(asset_ids, futures):
+            try:
+                plans.append(future.result())
+            except Exception as e:
+                failures.append({"asset_id": asset_id, "reason": str(e)})
+
+    LOGGER.info("Planned %d assets: %d ready, %d failing.", len(asset_ids),
+                len(plans), len(failures))
+    return plans, failures
+
+
+def write_plan_report(plans, failures, path):
+    """
+    Write the result of plan_auto_rig to a JSON file.
+
+    Args:
+        plans (list): The plans returned by plan_auto_rig.
+        failures (list): The failures returned by plan_auto_rig.
+        path (str): The report file.
+    """
+    with open(path, "w") as report:
+        json.dump({"plans": plans, "failures": failures}, report, indent=4)
+
+
+def select_nodes_in_namespace(namespace: str = "TEMP", select: bool = True):
+    """
+    Select all nodes belonging to a given namespace.
+
+    :param namespace: The namespace to search for nodes.
+    :param select: Select the nodes, only return them otherwise.
+    :return: The nodes of the namespace.
+    """
+    if not namespace:
+        cmds.error("Please provide a valid namespace.")
+        return
+
+    # List all nodes in the namespace
+    nodes_in_namespace = cmds.ls(f"{namespace}:*", long=True)
+
+    if not nodes_in_namespace:
+        cmds.warning(f"No nodes found in namespace: {namespace}")
+        return []
+
+    # Select all nodes in the namespace
+    if select:
+        cmds.select(nodes_in_namespace, replace=True)
+        SCENE_LOGGER.info("Selected %d nodes in namespace '%s'.",
+                          len(nodes_in_namespace), namespace)
+    return nodes_in_namespace
+
+
+def create_and_set_namespace(namespace_name="TEMP"):
+    """
+    Create a namespace and set it as the current namespace in Maya.
+    If the namespace already exists, it will simply set it as the current one.
+
+    :param namespace_name: The name of the namespace to create and set
+    (default is 'TEMP').
+    """
+    # Check if the namespace already exists
+    if not cmds.namespace(exists=namespace_name):
+        # Create the namespace if it doesn't exist
+        cmds.namespace(add=namespace_name)
+        SCENE_LOGGER.debug("Namespace '%s' created.", namespace_name)
+    else:
+        SCENE_LOGGER.debug("Namespace '%s' already exists.", namespace_name)
+
+    # Set the current namespace
+    cmds.namespace(set=namespace_name)
+    SCENE_LOGGER.info("Current namespace set to: %s", namespace_name)
+
+
+def delete_namespace(namespace_name=":TEMP", move_nodes_to_root=True):
+    """
+    Delete a namespace in Maya and set the namespace back to the root
+    namespace.
+
+    :param namespace_name: The name of the namespace to delete
+    (default is 'TEMP').
+    :param move_nodes_to_root: Whether to move nodes to the root namespace
     before deletion.
     """
     # Check if the namespace exists
@@ -314,90 +1776,146 @@ def delete_namespace(namespace_name=":TEMP", move_nodes_to_root=True):
         cmds.warning(f"Namespace '{namespace_name}' does not exist.")
         return
 
-    # Move nodes to root namespace if required
+    # Move nodes to root namespace if required, all renames are resolved
+    # before the first one is applied
     if move_nodes_to_root:
+        journal = SceneEditJournal()
         nodes_in_namespace = cmds.ls(f"{namespace_name}:*", long=True)
         for node in nodes_in_namespace:
             # Rename the node to remove the namespace
-            new_name = cmds.rename(node, node.split(":")[-1])
-            print(f"Moved '{node}' to root as '{new_name}'.")
+            journal.rename(node, node.split(":")[-1])
+        moved = journal.commit()
+        SCENE_LOGGER.info("Moved %d nodes to root.", moved)
 
     # Delete the namespace
     try:
         cmds.namespace(
             removeNamespace=namespace_name, mergeNamespaceWithRoot=True)
-        print(f"Namespace '{namespace_name}' has been deleted.")
+        SCENE_LOGGER.info("Namespace '%s' has been deleted.", namespace_name)
     except Exception as e:
         cmds.error(f"Failed to delete namespace '{namespace_name}': {e}")
 
     # Set the current namespace back to root ('')
     cmds.namespace(set=":")
-    print("Namespace has been set back to the root (':').")
+    SCENE_LOGGER.debug("Namespace has been set back to the root (':').")
+
+
+def get_parent_path(path):
+    """
+    Returns the parent of a DAG node from its full path, without querying
+    the scene.
+
+    Args:
+        path (str): Full DAG path of the node.
 
+    Returns:
+        str: Full path of the parent, or None for a top-level node.
+    """
+    return path.rpartition("|")[0] or None
+
+
+def get_root_path(path):
+    """
+    Returns the top-level ancestor of a DAG node from its full path, without
+    querying the scene.
+
+    Args:
+        path (str): Full DAG path of the node.
+
+    Returns:
+        str: Full path of the top-level node.
+    """
+    return "|" + path.lstrip("|").split("|", 1)[0]
+
+
+def build_hierarchy_index(nodes):
+    """
+    Builds a hierarchy index of the given DAG nodes from a single bulk
+    query of their full paths.
+
+    Args:
+        nodes (list): Names of the DAG nodes to index.
+
+    Returns:
+        dict: {full_path: parent_full_path} with None for top-level nodes,
+              in the order of the query.
+    """
+    paths = cmds.ls(nodes, long=True) if nodes else []
+    return {path: get_parent_path(path) for path in paths}
 
-def select_highest_parents():
+
+def select_highest_parents(nodes=None, select=True):
     """
     Select only the highest parent nodes from the current selection in Maya.
+
+    Args:
+        nodes (list): (Optional) Nodes to filter instead of the selection.
+        select (bool): Re-select the highest parents, only return them
+                       otherwise.
+
+    Returns:
+        list: Full paths of the highest parent nodes.
     """
     # Get the current selection
-    selection = cmds.ls(selection=True, long=True)
+    selection = nodes if nodes is not None else \
+        cmds.ls(selection=True, long=True)
 
     if not selection:
         cmds.warning("No objects selected.")
-        return
+        return []
 
-    # Find the highest parent nodes
-    highest_parents = []
-    for obj in selection:
-        parent = cmds.listRelatives(obj, parent=True, fullPath=True)
-        if not parent:
-            # If there's no parent, this is a top-level node
-            highest_parents.append(obj)
-        elif parent[0] not in selection:
-            # If the parent isn't in the selection, this is a highest parent
-            highest_parents.append(obj)
+    # Keep the nodes whose parent isn't in the selection, top-level nodes
+    # have no parent at all
+    hierarchy = build_hierarchy_index(selection)
+    highest_parents = [
+        path for path, parent in hierarchy.items() if parent not in hierarchy
+    ]
 
-    # Remove duplicates and re-select only the highest parents
-    highest_parents = list(set(highest_parents))
-    cmds.select(highest_parents, replace=True)
-    print(f"Selected highest parent nodes: {highest_parents}")
+    # Re-select only the highest parents
+    if select:
+        cmds.select(highest_parents, replace=True)
+        SCENE_LOGGER.info("Selected %d highest parent nodes.",
+                          len(highest_parents))
+    return highest_parents
 
 
-def update_task_status_to_pending_review(asset_id):
+def update_task_status_to_pending_review(asset_id, job=None):
     """
     Update the status of the Rig Task for an asset to "Pending Review".
 
     Args:
         asset_id (int): The ID of the asset in ShotGrid.
+        job (RigJob): (Optional) The rig job, the default one otherwise.
 
     Returns:
         bool: True if the task was successfully updated, False otherwise.
     """
-    # Connect to ShotGrid
-
+    job = job or get_default_rig_job()
     try:
         # Find the Rig Task associated with the asset
-        rig_task = sg.find_one(
-            "Task",
-            [["entity.Asset.id", "is", asset_id], ["content", "is", "Rig"]],
+        rig_task = job.shotgun.find_one(
+            "Task", job.task_filters(asset_id, "Rig"),
             ["id", "content", "sg_status_list"],
         )
 
         if not rig_task:
-            print(f"No Rig Task found for Asset ID {asset_id}.")
+            SHOTGRID_LOGGER.error("No Rig Task found for Asset ID %s.",
+                                  asset_id)
             return False
 
-        print(f"Found Rig Task: {rig_task}")
+        SHOTGRID_LOGGER.debug("Found Rig Task: %s", rig_task)
 
         # Update the task status to "Pending Review"
         # Replace "rev" with your ShotGrid's status code for "Pending Review"
-        updated_task = sg.update(
+        updated_task = job.shotgun.update(
             "Task", rig_task["id"], {"sg_status_list": "rev"})
-        print(f"Updated Task: {updated_task}")
+        SHOTGRID_LOGGER.info("Rig Task %s set to Pending Review.",
+                             rig_task["id"])
+        SHOTGRID_LOGGER.debug("Updated Task: %s", updated_task)
         return True
 
     except Exception as e:
-        print(f"Error updating task status: {e}")
+        SHOTGRID_LOGGER.error("Error updating task status: %s", e)
         return False
 
 
@@ -445,6 +1963,122 @@ def get_highest_bounding_box_distance(geo_list):
     return max(distance_x, distance_z)
 
 
+def get_fit_matrix(scale_x, scale_y, scale_z):
+    """
+    Builds the matrix that scales a controller shape and lifts it by half
+    its height.
+
+    Args:
+        scale_x (float): Desired scale in X direction.
+        scale_y (float): Desired scale in Y direction.
+        scale_z (float): Desired scale in Z direction.
+
+    Returns:
+        om.MMatrix: The scale matrix with Translate Y set to scale_y / 2.
+    """
+    return om.MMatrix([
+        [scale_x, 0, 0, 0],
+        [0, scale_y, 0, 0],
+        [0, 0, scale_z, 0],
+        [0, scale_y / 2, 0, 1]  # Translate Y is scale_y / 2
+    ])
+
+
+def get_controller_shape(node):
+    """
+    Resolves the shape node a controller fit applies to.
+
+    Args:
+        node (str): Name of the transform or shape node.
+
+    Returns:
+        om.MObject: The first shape below a transform, the node itself
+                    otherwise, or None if it cannot be resolved.
+    """
+    selection = om.MSelectionList()
+    try:
+        selection.add(node)
+    except RuntimeError:
+        cmds.warning(f"Node '{node}' does not exist.")
+        return None
+
+    node_object = selection.getDependNode(0)
+    if not node_object.hasFn(om.MFn.kTransform):
+        return node_object  # Assume it's already a shape node
+
+    transform = om.MFnDagNode(node_object)
+    for index in range(transform.childCount()):
+        child = transform.child(index)
+        if child.hasFn(om.MFn.kShape):
+            return child  # Use the first shape node
+
+    cmds.warning(f"Transform '{node}' has no shape node.")
+    return None
+
+
+def fit_controller_shapes(fit_table, journal=None):
+    """
+    Updates the offsetMatrix attribute of several controller shapes at once.
+    Missing attributes are added in a first modifier, then every new matrix
+    is applied in a single MDGModifier pass, both through apply_modifier so
+    they can be undone.
+
+    Args:
+        fit_table (list): (node, scale_x, scale_y, scale_z) tuples, node
+                          being the name of a transform or shape node.
+        journal (SceneEditJournal): (Optional) Queue the new matrices in this
+                                    journal instead of applying them.
+
+    Returns:
+        list: Names of the updated shape nodes.
+    """
+    shapes = []
+    attribute_modifier = om.MDGModifier()
+    missing_attributes = False
+    for node, scale_x, scale_y, scale_z in fit_table:
+        shape = get_controller_shape(node)
+        if shape is None:
+            continue
+        shape_fn = om.MFnDependencyNode(shape)
+
+        # Check if offsetMatrix exists, otherwise create it
+        if not shape_fn.hasAttribute("offsetMatrix"):
+            attribute = om.MFnTypedAttribute().create(
+                "offsetMatrix", "offsetMatrix", om.MFnData.kMatrix)
+            attribute_modifier.addAttribute(shape, attribute)
+            missing_attributes = True
+        shapes.append(
+            (shape_fn, get_fit_matrix(scale_x, scale_y, scale_z)))
+
+    if missing_attributes:
+        # Applied now, the journal validates the plugs it is given
+        apply_modifier(attribute_modifier)
+
+    modifier = om.MDGModifier()
+    for shape_fn, scale_matrix in shapes:
+        plug = shape_fn.findPlug("offsetMatrix", False)
+
+        # Get current offsetMatrix, a new attribute holds no data yet
+        data = plug.asMObject()
+        if data.isNull():
+            matrix = om.MMatrix()
+        else:
+            matrix = om.MFnMatrixData(data).matrix()
+
+        # Apply scaling and translation
+        if journal is not None:
+            shape_path = om.MDagPath.getAPathTo(shape_fn.object())
+            journal.set_attr(f"{shape_path.fullPathName()}.offsetMatrix",
+                             matrix * scale_matrix)
+        else:
+            new_data = om.MFnMatrixData().create(matrix * scale_matrix)
+            modifier.newPlugValue(plug, new_data)
+
+    if journal is None and shapes:
+        apply_modifier(modifier)
+    return [shape_fn.name() for shape_fn, _ in shapes]
+
+
 def update_offset_matrix(node, scale_x, scale_y, scale_z):
     """
     Updates the offsetMatrix attribute of a given shape node to fit the desired
@@ -456,160 +2090,554 @@ def update_offset_matrix(node, scale_x, scale_y, scale_z):
         scale_y (float): Desired scale in Y direction.
         scale_z (float): Desired scale in Z direction.
     """
-    if not cmds.objExists(node):
+    for shape_node in fit_controller_shapes(
+            [(node, scale_x, scale_y, scale_z)]):
+        BIND_LOGGER.info("Updated offsetMatrix for %s with scale (%s, %s, "
+                         "%s) and Translate Y = %s", shape_node, scale_x,
+                         scale_y, scale_z, scale_y / 2)
+
+
+def get_controller_fit_table(bounding_scale, fit_rules):
+    """
+    Computes the controller scales for a bounding size.
+
+    Args:
+        bounding_scale (float): Highest X/Z distance of the geometry.
+        fit_rules (list): (node, width_ratio, height_ratio) tuples, both
+                          ratios being relative to bounding_scale.
+
+    Returns:
+        list: (node, scale_x, scale_y, scale_z) tuples for
+              fit_controller_shapes.
+    """
+    return [
+        (node, bounding_scale * width_ratio, bounding_scale * height_ratio,
+         bounding_scale * width_ratio)
+        for node, width_ratio, height_ratio in fit_rules
+    ]
+
+
+def is_camera(node):
+    """
+    Checks if the given transform node is a camera.
+
+    Args:
+        node (str): The name of the transform node.
+
+    Returns:
+        bool: True if the node is a camera, False otherwise.
+    """
+    if not query_exists(node):
+        cmds.warning(f"Node '{node}' does not exist.")
+        return False
+
+    # Get all child shapes of the node
+    shapes = query_shapes(node)
+
+    # Check if any of the child shapes are cameras
+    for shape in shapes:
+        if query_node_type(shape) == "camera":
+            return True
+
+    return False
+
+
+def register_rig_tag_attribute(attribute):
+    """
+    Marks the nodes carrying an attribute as rig-owned, for templates tagging
+    their nodes with other attributes than RIG_TAG_ATTRIBUTES.
+
+    Args:
+        attribute (str): Name of the tag attribute.
+    """
+    if attribute not in RIG_TAG_ATTRIBUTES:
+        RIG_TAG_ATTRIBUTES.append(attribute)
+
+
+def build_rig_tag_index():
+    """
+    Collects every node carrying one of the RIG_TAG_ATTRIBUTES with a single
+    ls query.
+
+    Returns:
+        set: Full paths (names for DG nodes) of the rig-owned nodes.
+    """
+    patterns = [f"*.{attribute}" for attribute in RIG_TAG_ATTRIBUTES]
+    return set(cmds.ls(patterns, recursive=True, objectsOnly=True,
+                       long=True))
+
+
+def has_objectType(node, tag_index=None):
+    """
+    Checks if the given node has the attribute 'rig_objectType'.
+
+    Args:
+        node (str): The name of the Maya node to check.
+        tag_index (set): (Optional) Index built by build_rig_tag_index, node
+        must then be a full path.
+
+    Returns:
+        bool: True if the attribute exists, False otherwise.
+    """
+    if tag_index is not None:
+        return node in tag_index
+
+    if not query_exists(node):
         cmds.warning(f"Node '{node}' does not exist.")
+        return False
+
+    for attribute in RIG_TAG_ATTRIBUTES:
+        if query_has_attribute(node, attribute):
+            return True
+    return False
+
+
+def is_mesh(node):
+    """
+    Returns:
+        bool: True if the transform has a (non intermediate) mesh shape.
+    """
+    shapes = query_shapes(node, no_intermediate=True)
+    return bool(shapes) and query_node_type(shapes[0]) == "mesh"
+
+
+def bind_skin_like_maya(node_list):
+    """
+    Mimics Maya's "Bind Skin" button behavior. Automatically detects meshes and
+    joints from the provided node list and binds them.
+
+    Args:
+        node_list (list): List of nodes (geometry and joints) to process.
+    """
+    if not node_list:
+        cmds.warning(
+            "No nodes provided. Please provide a list of mesh and joint nodes."
+            )
         return
 
-    # Get shape node if a transform is given
-    if cmds.objectType(node) == "transform":
-        shapes = cmds.listRelatives(node, shapes=True, fullPath=True) or []
-        if not shapes:
-            cmds.warning(f"Transform '{node}' has no shape node.")
-            return
-        shape_node = shapes[0]  # Use the first shape node
-    else:
-        shape_node = node  # Assume it's already a shape node
+    meshes = []
+    joints = []
+
+    # Sort the node list into meshes and joints
+    for obj in node_list:
+        if query_node_type(obj) == "joint":
+            joints.append(obj)
+        elif is_mesh(obj):
+            meshes.append(obj)
+
+    # Ensure both meshes and joints are present
+    if not meshes:
+        cmds.warning("No valid meshes found in the provided nodes.")
+        return
+    if not joints:
+        cmds.warning("No valid joints found in the provided nodes.")
+        return
+
+    # Bind each mesh to all selected joints using default Maya settings
+    for mesh in meshes:
+        # Referenced meshes live in a read-only namespace, keep the deformer
+        # in the current one
+        mesh_name = mesh.split("|")[-1].split(":")[-1]
+        skin_cluster = cmds.skinCluster(
+            joints, mesh,
+            toSelectedBones=True,  # Similar to default Bind Skin behavior
+            bindMethod=0,  # Closest distance
+            normalizeWeights=1,  # Interactive normalization
+            skinMethod=0,  # Classic linear skinning
+            maximumInfluences=4,  # Default influence limit
+            dropoffRate=4.0,  # Default dropoff rate
+            name=f"{mesh_name}_skinCluster"
+        )[0]
 
-    # Check if offsetMatrix exists, otherwise create it
-    if not cmds.attributeQuery("offsetMatrix", node=shape_node, exists=True):
-        cmds.addAttr(shape_node, longName="offsetMatrix", dataType="matrix")
+        BIND_LOGGER.debug("SkinCluster '%s' created for mesh '%s' with "
+                          "joints %s", skin_cluster, mesh, joints)
 
-    # Get current offsetMatrix
-    current_matrix = cmds.getAttr(shape_node + ".offsetMatrix")
+    BIND_LOGGER.info("Created %d skinClusters on %d joints.", len(meshes),
+                     len(joints))
 
-    # Convert to OpenMaya matrix
-    matrix = om.MMatrix(current_matrix)
 
-    # Create scale matrix
-    scale_matrix = om.MMatrix([
-        [scale_x, 0, 0, 0],
-        [0, scale_y, 0, 0],
-        [0, 0, scale_z, 0],
-        [0, scale_y / 2, 0, 1]  # Translate Y is scale_y / 2
-    ])
+# Elements of the (targets x sources) distance matrix computed at once by
+# find_nearest_points without SciPy
+NEAREST_POINT_CHUNK = 2 ** 22
+
+
+def get_skin_cluster(mesh):
+    """
+    Returns:
+        str: The skinCluster deforming a mesh, None if it is not skinned.
+    """
+    skin_clusters = cmds.ls(
+        cmds.listHistory(mesh, pruneDagObjects=True) or [],
+        type="skinCluster")
+    return skin_clusters[0] if skin_clusters else None
+
+
+def get_mesh_points(mesh):
+    """
+    Returns:
+        numpy.ndarray: (vertices, 3) world positions of the mesh vertices.
+    """
+    positions = cmds.xform(f"{mesh}.vtx[*]", query=True, worldSpace=True,
+                           translation=True)
+    return np.array(positions, dtype=np.float64).reshape(-1, 3)
+
+
+def get_skin_function_set(mesh):
+    """
+    Returns:
+        tuple: (MFnSkinCluster, shape MDagPath, complete vertex component)
+               of a skinned mesh, for bulk weight reads and writes.
+    """
+    selection = om.MSelectionList()
+    selection.add(get_skin_cluster(mesh))
+    selection.add(mesh)
+    skin = oma.MFnSkinCluster(selection.getDependNode(0))
+    shape = selection.getDagPath(1).extendToShape()
+    component_fn = om.MFnSingleIndexedComponent()
+    component = component_fn.create(om.MFn.kMeshVertComponent)
+    component_fn.setCompleteData(om.MFnMesh(shape).numVertices)
+    return skin, shape, component
+
+
+def get_skin_weights(mesh, influences):
+    """
+    Read all the skin weights of a mesh at once.
+
+    Args:
+        mesh (str): The skinned mesh.
+        influences (list): Influence names, the order of the columns.
+
+    Returns:
+        numpy.ndarray: (vertices, influences) weights.
+    """
+    skin, shape, component = get_skin_function_set(mesh)
+    weights, influence_count = skin.getWeights(shape, component)
+    weights = np.array(weights, dtype=np.float64).reshape(
+        -1, influence_count)
+    names = [path.partialPathName() for path in skin.influenceObjects()]
+    columns = np.zeros((len(weights), len(influences)))
+    for column, influence in enumerate(influences):
+        if influence in names:
+            columns[:, column] = weights[:, names.index(influence)]
+    return columns
+
+
+def set_skin_weights(mesh, influences, weights):
+    """
+    Write all the skin weights of a mesh at once.
+
+    Args:
+        mesh (str): The skinned mesh.
+        influences (list): Influence names, the order of the columns.
+        weights (numpy.ndarray): (vertices, influences) weights.
+    """
+    skin, shape, component = get_skin_function_set(mesh)
+    names = [path.partialPathName() for path in skin.influenceObjects()]
+    order = [influences.index(name) for name in names]
+    skin.setWeights(shape, component, om.MIntArray(range(len(names))),
+                    om.MDoubleArray(weights[:, order].ravel().tolist()),
+                    normalize=False)
+
+
+def find_nearest_points(source_points, target_points):
+    """
+    Find the nearest source point of every target point, with a KD-tree
+    when SciPy is available, by chunks of a distance matrix otherwise.
+
+    Args:
+        source_points (numpy.ndarray): (n, 3) points to search.
+        target_points (numpy.ndarray): (m, 3) points to match.
+
+    Returns:
+        numpy.ndarray: (m,) index of the nearest source point.
+    """
+    if hasScipy:
+        return cKDTree(source_points).query(target_points)[1]
+
+    # |t - s|^2 = |t|^2 - 2 t.s + |s|^2, |t|^2 doesn't change the argmin
+    source_norms = (source_points ** 2).sum(axis=1)
+    chunk = max(1, NEAREST_POINT_CHUNK // len(source_points))
+    nearest = np.empty(len(target_points), dtype=np.int64)
+    for start in range(0, len(target_points), chunk):
+        block = target_points[start:start + chunk]
+        distances = source_norms - 2.0 * block @ source_points.T
+        nearest[start:start + chunk] = distances.argmin(axis=1)
+    return nearest
+
+
+def transfer_skin_weights(source_meshes, target_meshes):
+    """
+    Skin target meshes to the influences of bound source meshes and copy
+    the weights of the nearest source vertex, in bulk. Used to rig every
+    LOD at the cost of one bind.
+
+    Args:
+        source_meshes (list): Meshes already bound (bind_skin_like_maya).
+        target_meshes (list): Meshes to skin, e.g. the other LODs.
+    """
+    source_meshes = [mesh for mesh in source_meshes
+                     if is_mesh(mesh) and get_skin_cluster(mesh)]
+    target_meshes = [mesh for mesh in target_meshes if is_mesh(mesh)]
+    if not source_meshes or not target_meshes:
+        BIND_LOGGER.warning("No weights to transfer.")
+        return
+    start = time.perf_counter()
+    influences = cmds.skinCluster(get_skin_cluster(source_meshes[0]),
+                                  query=True, influence=True)
+
+    for mesh in target_meshes:
+        # The weights are replaced right after, one influence per vertex
+        # keeps the bind weights sparse until then
+        mesh_name = mesh.split("|")[-1].split(":")[-1]
+        cmds.skinCluster(influences, mesh, toSelectedBones=True,
+                         bindMethod=0, normalizeWeights=1, skinMethod=0,
+                         maximumInfluences=1,
+                         name=f"{mesh_name}_skinCluster")
+
+    if not hasNumpy:
+        for mesh in target_meshes:
+            cmds.copySkinWeights(source_meshes + [mesh], noMirror=True,
+                                 surfaceAssociation="closestPoint",
+                                 influenceAssociation=["name",
+                                                       "closestJoint"])
+    else:
+        source_points = np.concatenate(
+            [get_mesh_points(mesh) for mesh in source_meshes])
+        source_weights = np.concatenate(
+            [get_skin_weights(mesh, influences) for mesh in source_meshes])
+        for mesh in target_meshes:
+            nearest = find_nearest_points(source_points,
+                                          get_mesh_points(mesh))
+            set_skin_weights(mesh, influences, source_weights[nearest])
+
+    BIND_LOGGER.info("Transferred weights from %d to %d meshes in %.2fs.",
+                     len(source_meshes), len(target_meshes),
+                     time.perf_counter() - start)
 
-    # Apply scaling and translation
-    new_matrix = matrix * scale_matrix
 
-    # Set updated offsetMatrix
-    cmds.setAttr(shape_node + ".offsetMatrix", list(new_matrix), type="matrix")
+def get_all_geo_from_scene():
+    """
+    Returns a list of all geometry objects in the scene.
 
-    print(f"Updated offsetMatrix for {shape_node} with scale ({scale_x}, "
-          f"{scale_y}, {scale_z}) and Translate Y = {scale_y / 2}")
+    Returns:
+        list: A list of geometry node names (excluding cameras and nodes with
+              'rig_objectType' attribute).
+    """
+    tag_index = build_rig_tag_index()
+    return [node for node in cmds.ls(exactType="transform", long=True)
+            if not has_objectType(node, tag_index)
+            and not is_camera(node)]
 
 
-def is_camera(node):
+def get_geo_from_nodes(nodes):
     """
-    Checks if the given transform node is a camera.
+    Returns the geometry objects among the given nodes, typically the nodes
+    returned by an import.
 
     Args:
-        node (str): The name of the transform node.
+        nodes (list): Node names to filter.
 
     Returns:
-        bool: True if the node is a camera, False otherwise.
+        list: A list of geometry node names (excluding cameras and nodes with
+              'rig_objectType' attribute).
     """
-    if not cmds.objExists(node):
-        cmds.warning(f"Node '{node}' does not exist.")
-        return False
-
-    # Get all child shapes of the node
-    shapes = cmds.listRelatives(node, shapes=True, fullPath=True) or []
+    if not nodes:
+        return []
+    tag_index = build_rig_tag_index()
+    return [node for node in cmds.ls(nodes, exactType="transform", long=True)
+            if not has_objectType(node, tag_index)
+            and not is_camera(node)]
 
-    # Check if any of the child shapes are cameras
-    for shape in shapes:
-        if cmds.nodeType(shape) == "camera":
-            return True
 
-    return False
+def get_heap_memory_mb():
+    """
+    Returns:
+        float: Memory used by the Maya heap in MB.
+    """
+    memory = cmds.memory(heapMemory=True, megaByte=True)
+    return float(memory[0] if isinstance(memory, list) else memory)
 
 
-def has_objectType(node):
+def sanitize_geometry(nodes):
     """
-    Checks if the given node has the attribute 'rig_objectType'.
+    Strip the imported meshes down to what the bind needs: non-deformer
+    construction history is baked, and intermediate shapes feeding nothing
+    are deleted. Deformers already on the meshes are kept. Referenced
+    meshes are left alone.
 
     Args:
-        node (str): The name of the Maya node to check.
+        nodes (list): Nodes returned by the geometry import.
 
     Returns:
-        bool: True if the attribute exists, False otherwise.
+        tuple: (nodes, report) the import nodes still in the scene, and the
+               scene node count and heap memory (MB) before and after.
     """
-    if not cmds.objExists(node):
-        cmds.warning(f"Node '{node}' does not exist.")
-        return False
-
-    if cmds.attributeQuery("rig_objectType", node=node, exists=True) or \
-            cmds.attributeQuery("pip_groupType", node=node, exists=True):
-        return True
-    return False
+    nodes_before = len(cmds.ls())
+    memory_before = get_heap_memory_mb()
+    meshes = [node for node in get_geo_from_nodes(nodes)
+              if is_mesh(node)
+              and not cmds.referenceQuery(node, isNodeReferenced=True)]
 
+    if meshes:
+        cmds.bakePartialHistory(meshes, prePostDeformers=True)
 
-def bind_skin_like_maya(node_list):
+    orphans = []
+    for mesh in meshes:
+        for shape in cmds.listRelatives(mesh, shapes=True, fullPath=True,
+                                        type="mesh") or []:
+            # Set and shadingEngine membership (instObjGroups) doesn't count,
+            # only a mesh output still feeding a node does
+            if cmds.getAttr(shape + ".intermediateObject") and not any(
+                    cmds.listConnections(f"{shape}.{output}", source=False,
+                                         destination=True)
+                    for output in ("outMesh", "worldMesh")):
+                orphans.append(shape)
+    if orphans:
+        cmds.delete(orphans)
+
+    report = {
+        "nodes_before": nodes_before,
+        "nodes_after": len(cmds.ls()),
+        "memory_before": memory_before,
+        "memory_after": get_heap_memory_mb(),
+        "orphan_intermediates": len(orphans),
+    }
+    BIND_LOGGER.info("Sanitized %d meshes: scene nodes %d -> %d, heap "
+                     "%.1f -> %.1f MB, %d orphan intermediate shapes "
+                     "deleted.", len(meshes), report["nodes_before"],
+                     report["nodes_after"], report["memory_before"],
+                     report["memory_after"], len(orphans))
+    return [node for node in nodes if cmds.objExists(node)], report
+
+
+def get_shading_groups(mesh):
     """
-    Mimics Maya's "Bind Skin" button behavior. Automatically detects meshes and
-    joints from the provided node list and binds them.
-
-    Args:
-        node_list (list): List of nodes (geometry and joints) to process.
+    Returns:
+        tuple: Sorted shading groups assigned to the mesh (or its faces).
     """
-    if not node_list:
-        cmds.warning(
-            "No nodes provided. Please provide a list of mesh and joint nodes."
-            )
-        return
+    shapes = query_shapes(mesh, no_intermediate=True)
+    return tuple(sorted(set(cmds.listConnections(
+        shapes, type="shadingEngine") or [])))
 
-    meshes = []
-    joints = []
 
-    # Sort the node list into meshes and joints
-    for obj in node_list:
-        if cmds.nodeType(obj) == "joint":
-            joints.append(obj)
-        elif cmds.listRelatives(obj, shapes=True, noIntermediate=True) and \
-                cmds.objectType(
-                    cmds.listRelatives(obj, shapes=True)[0]) == "mesh":
-            meshes.append(obj)
+def consolidate_meshes(nodes):
+    """
+    Combine the meshes sharing the same shading groups, so the bind creates
+    one skinCluster per material set instead of one per piece. UVs and
+    per-face material assignments are kept, the construction history is
+    not. Referenced meshes are left alone.
 
-    # Ensure both meshes and joints are present
-    if not meshes:
-        cmds.warning("No valid meshes found in the provided nodes.")
-        return
-    if not joints:
-        cmds.warning("No valid joints found in the provided nodes.")
-        return
+    Args:
+        nodes (list): Nodes returned by the geometry import.
 
-    # Bind each mesh to all selected joints using default Maya settings
+    Returns:
+        tuple: (nodes, report) the import nodes with the combined meshes in
+               place of their pieces, and the meshes and nodes counts before
+               and after.
+    """
+    nodes_before = len(cmds.ls())
+    meshes = [node for node in get_geo_from_nodes(nodes)
+              if is_mesh(node)
+              and not cmds.referenceQuery(node, isNodeReferenced=True)]
+    groups = collections.OrderedDict()
     for mesh in meshes:
-        skin_cluster = cmds.skinCluster(
-            joints, mesh,
-            toSelectedBones=True,  # Similar to default Bind Skin behavior
-            bindMethod=0,  # Closest distance
-            normalizeWeights=1,  # Interactive normalization
-            skinMethod=0,  # Classic linear skinning
-            maximumInfluences=4,  # Default influence limit
-            dropoffRate=4.0,  # Default dropoff rate
-            name=f"{mesh}_skinCluster"
-        )[0]
+        groups.setdefault(get_shading_groups(mesh), []).append(mesh)
+
+    combined = []
+    consumed = []
+    with preserve_selection():
+        for shading_groups, pieces in groups.items():
+            if len(pieces) < 2:
+                continue
+            parent = get_parent_path(pieces[0])
+            name = pieces[0].split("|")[-1].split(":")[-1]
+            mesh = cmds.polyUnite(pieces, mergeUVSets=1,
+                                  constructionHistory=False,
+                                  name=f"{name}_combined")[0]
+            if parent and cmds.objExists(parent):
+                mesh = cmds.parent(mesh, parent)[0]
+            combined.append(cmds.ls(mesh, long=True)[0])
+            consumed.extend(pieces)
+
+        # Deepest first, a piece is only deleted once it has no child left
+        for piece in sorted(consumed, key=len, reverse=True):
+            if cmds.objExists(piece) and not cmds.listRelatives(
+                    piece, children=True, type="transform"):
+                cmds.delete(piece)
+
+    remaining = [node for node in nodes if cmds.objExists(node)]
+    report = {
+        "meshes_before": len(meshes),
+        "meshes_after": len(meshes) - len(consumed) + len(combined),
+        "nodes_before": nodes_before,
+        "nodes_after": len(cmds.ls()),
+    }
+    BIND_LOGGER.info("Consolidated %d meshes into %d, scene nodes %d -> %d.",
+                     report["meshes_before"], report["meshes_after"],
+                     report["nodes_before"], report["nodes_after"])
+    return remaining + combined, report
+
+
+def measure_rig_evaluation(main_joint, meshes, samples=10):
+    """
+    Time the deformation of bound meshes by rotating the main joint and
+    pulling the deformed bounding boxes. The joint is put back at rest.
+
+    Args:
+        main_joint (str): The joint the meshes are bound to.
+        meshes (list): The bound meshes.
+        samples (int): Number of evaluated poses.
 
-        print(f"SkinCluster '{skin_cluster}' created for mesh '{mesh}' with "
-              f"joints {joints}")
+    Returns:
+        float: Average evaluation time of a pose in milliseconds, None when
+               the joint rotation is locked or driven.
+    """
+    if not meshes:
+        return 0.0
+    attribute = main_joint + ".rotateY"
+    if not cmds.getAttr(attribute, settable=True):
+        return None
+    rest = cmds.getAttr(attribute)
+    start = time.perf_counter()
+    for sample in range(samples):
+        cmds.setAttr(attribute, rest + 360.0 * (sample + 1) / samples)
+        cmds.exactWorldBoundingBox(meshes)
+    elapsed = time.perf_counter() - start
+    cmds.setAttr(attribute, rest)
+    return elapsed * 1000.0 / samples
 
 
-def get_all_geo_from_scene():
+def measure_unbound_evaluation(main_joint, meshes, samples=10):
     """
-    Returns a list of all geometry objects in the scene.
+    Time the deformation of meshes not bound yet, each skinned to the main
+    joint for the measure only. Gives the cost consolidate_meshes is
+    compared against.
+
+    Args:
+        main_joint (str): The joint to bind the meshes to.
+        meshes (list): The meshes, left without skinCluster.
+        samples (int): Number of evaluated poses.
 
     Returns:
-        list: A list of geometry node names (excluding cameras and nodes with
-              'rig_objectType' attribute).
+        float: See measure_rig_evaluation.
     """
-    return [node for node in cmds.ls() if cmds.nodeType(node) == "transform"
-            and not has_objectType(node)
-            and not is_camera(node)]
+    skin_clusters = []
+    with preserve_selection():
+        try:
+            for mesh in meshes:
+                skin_clusters.append(cmds.skinCluster(
+                    main_joint, mesh, toSelectedBones=True, bindMethod=0,
+                    skinMethod=0, normalizeWeights=1)[0])
+            return measure_rig_evaluation(main_joint, meshes, samples)
+        finally:
+            for skin_cluster in skin_clusters:
+                cmds.skinCluster(skin_cluster, edit=True, unbind=True)
 
 
 def bind_all_geo_to_main_joint(
         main_joint="main_JNT", local_controller="local_FK_CON",
-        global_controller="global_FK_CON"):
+        global_controller="global_FK_CON", nodes=None, fit_rules=None,
+        select=True, bounds=None):
     """
     Binds all geometry in the scene to the provided main joint using the
     specified controllers for offset.
@@ -618,94 +2646,115 @@ def bind_all_geo_to_main_joint(
         main_joint (str): Name of the main joint to bind the geometry to.
         local_controller (str): Name of the local controller.
         global_controller (str): Name of the global controller.
+        nodes (list): (Optional) Nodes returned by the geometry import, only
+                      their geometry is bound. The whole scene is scanned
+                      when omitted.
+        fit_rules (list): (Optional) (node, width_ratio, height_ratio)
+                          tuples of extra controllers to fit to the geometry,
+                          see get_controller_fit_table.
+        select (bool): Clear the selection once bound, leave it untouched
+                       otherwise.
+        bounds (list): (Optional) World bounds of the geometry (xmin, ymin,
+                       zmin, xmax, ymax, zmax), e.g. from the publish
+                       sidecar. The geometry is measured when omitted.
     """
-    geo = get_all_geo_from_scene()
-    bounding_scale = get_highest_bounding_box_distance(geo)
+    if nodes is None:
+        geo = get_all_geo_from_scene()
+    else:
+        geo = get_geo_from_nodes(nodes)
+    if bounds:
+        bounding_scale = max(bounds[3] - bounds[0], bounds[5] - bounds[2])
+    else:
+        bounding_scale = get_highest_bounding_box_distance(geo)
 
-    local_bouding_scale = bounding_scale * 0.85
-    # Update the offset matrix for the controllers
-    update_offset_matrix(local_controller + "Shape", local_bouding_scale,
-                         local_bouding_scale / 10, local_bouding_scale)
-    update_offset_matrix(global_controller + "Shape", bounding_scale,
-                         bounding_scale / 20, bounding_scale)
+    # Update the offset matrix for all the controllers in one pass
+    controller_rules = [
+        (local_controller, 0.85, 0.085),
+        (global_controller, 1.0, 0.05),
+    ]
+    controller_rules.extend(fit_rules or [])
+    fit_controller_shapes(
+        get_controller_fit_table(bounding_scale, controller_rules))
 
     # Append the main joint to the geometry list for binding
     to_bind = geo
     to_bind.append(main_joint)
     bind_skin_like_maya(to_bind)
-    cmds.select(cl=True)
-    print("All geometry bound to the main joint.")
+    if select:
+        cmds.select(cl=True)
+    BIND_LOGGER.info("All geometry bound to the main joint.")
 
 
-def update_task_status_to_final(asset_id):
+def update_task_status_to_final(asset_id, job=None):
     """
     Update the status of the Rig Task for an asset to "Final".
 
     Args:
         asset_id (int): The ID of the asset in ShotGrid.
+        job (RigJob): (Optional) The rig job, the default one otherwise.
 
     Returns:
         bool: True if the task was successfully updated, False otherwise.
     """
-    # Connect to ShotGrid
+    job = job or get_default_rig_job()
     try:
         # Find the Rig Task associated with the asset
-        rig_task = sg.find_one(
-            "Task",
-            [["entity.Asset.id", "is", asset_id], ["content", "is", "Rig"]],
+        rig_task = job.shotgun.find_one(
+            "Task", job.task_filters(asset_id, "Rig"),
             ["id", "content", "sg_status_list"],
         )
 
         if not rig_task:
-            print(f"No Rig Task found for Asset ID {asset_id}.")
+            SHOTGRID_LOGGER.error("No Rig Task found for Asset ID %s.",
+                                  asset_id)
             return False
 
-        print(f"Found Rig Task: {rig_task}")
+        SHOTGRID_LOGGER.debug("Found Rig Task: %s", rig_task)
 
         # Update the task status to "Final"
         # Replace "fin" with your ShotGrid's status code for "Final"
-        updated_task = sg.update(
+        updated_task = job.shotgun.update(
             "Task", rig_task["id"], {"sg_status_list": "fin"})
-        print(f"Updated Task to Final: {updated_task}")
+        SHOTGRID_LOGGER.info("Rig Task %s set to Final.", rig_task["id"])
+        SHOTGRID_LOGGER.debug("Updated Task: %s", updated_task)
         return True
 
     except Exception as e:
-        print(f"Error updating task status to Final: {e}")
+        SHOTGRID_LOGGER.error("Error updating task status to Final: %s", e)
         return False
 
 
-def get_highest_node_from(start_node):
+def get_highest_node_from(start_node, select=True):
     """
     Select the highest node in the hierarchy starting from a specific node.
 
     Args:
         start_node (str): The name of the node from which to start searching.
+        select (bool): Select the start node when it is already the highest
+                       one.
+
+    Returns:
+        str: Name of the highest node.
     """
-    # Check if the node exists
-    if not cmds.objExists(start_node):
+    # Resolve the full path of the start node, its root is the first segment
+    paths = cmds.ls(start_node, long=True)
+    if not paths:
         cmds.error(f"Node '{start_node}' does not exist.")
         return
 
-    # Get the parent node of the start node
-    parent_node = cmds.listRelatives(start_node, parent=True)
-
     # If there is no parent node, the start node is already the highest node
-    if not parent_node:
-        print(f"'{start_node}' is already the highest node.")
-        cmds.select(start_node)
+    if not get_parent_path(paths[0]):
+        SCENE_LOGGER.debug("'%s' is already the highest node.", start_node)
+        if select:
+            cmds.select(start_node)
         return start_node
 
-    # Traverse up the hierarchy until the root is reached (node with no parent)
-    highest_node = start_node
-    while parent_node:
-        highest_node = parent_node[0]
-        parent_node = cmds.listRelatives(highest_node, parent=True)
-
-    # Select the highest node
+    # Top-level names are unique, the short name identifies the root
+    highest_node = get_root_path(paths[0]).lstrip("|")
     return highest_node
 
 
-def verify_and_rename_node(node_name, new_name):
+def verify_and_rename_node(node_name, new_name, journal=None):
     """
     Verifies if the name of the given node matches the entered name.
     If not, renames the node to the entered name.
@@ -714,6 +2763,8 @@ def verify_and_rename_node(node_name, new_name):
         node_name (str): The current name of the node.
         new_name (str): The desired name to compare against and rename the
         node if different.
+        journal (SceneEditJournal): (Optional) Queue the rename in this
+        journal instead of renaming right away.
     """
     # Check if the node exists
     if not cmds.objExists(node_name):
@@ -724,17 +2775,80 @@ def verify_and_rename_node(node_name, new_name):
     current_name = node_name
 
     # Check if the current name matches the new name
-    if current_name != new_name:
+    if current_name != new_name and journal is not None:
+        journal.rename(current_name, new_name)
+    elif current_name != new_name:
         try:
             # Rename the node
             cmds.rename(current_name, new_name)
-            print(f"Node '{current_name}' renamed to '{new_name}'.")
+            SCENE_LOGGER.info("Node '%s' renamed to '%s'.", current_name,
+                              new_name)
         except Exception as e:
             cmds.error(f"Failed to rename node: {e}")
     else:
-        print(
-            f"Node '{current_name}' already has the desired name '{new_name}'."
-            )
+        SCENE_LOGGER.debug(
+            "Node '%s' already has the desired name '%s'.", current_name,
+            new_name)
+
+
+def build_node_registry(nodes, roles, registry=None):
+    """
+    Maps roles to the nodes carrying their names among freshly imported
+    nodes, so later stages no longer look them up by short name.
+
+    Args:
+        nodes (list): Names of the imported nodes, as returned by the import.
+        roles (dict): Role -> node name (namespace excluded) to look for.
+        registry (dict): (Optional) Registry to extend.
+
+    Returns:
+        dict: Role -> (uuid, om.MObjectHandle) of the matched nodes.
+    """
+    role_by_name = {name: role for role, name in roles.items()}
+    registry = {} if registry is None else registry
+    for node in nodes:
+        role = role_by_name.get(node.split("|")[-1].split(":")[-1])
+        if role is None or role in registry:
+            continue
+        selection = om.MSelectionList()
+        selection.add(node)
+        node_object = selection.getDependNode(0)
+        uuid = om.MFnDependencyNode(node_object).uuid().asString()
+        registry[role] = (uuid, om.MObjectHandle(node_object))
+
+    missing = [role for role in roles if role not in registry]
+    if missing:
+        cmds.warning(f"Imported nodes miss the roles: {missing}")
+    return registry
+
+
+def resolve_node(registry, role):
+    """
+    Returns the current unique name of the node registered for a role. The
+    UUID is used when the handle went stale (e.g. the scene was reopened).
+
+    Args:
+        registry (dict): Registry built by build_node_registry.
+        role (str): The role to resolve.
+
+    Returns:
+        str: Full DAG path of the node, or its name for DG nodes.
+    """
+    if role not in registry:
+        cmds.error(f"No node registered for role '{role}'.")
+        return
+    uuid, handle = registry[role]
+    if handle.isValid():
+        node_object = handle.object()
+        if node_object.hasFn(om.MFn.kDagNode):
+            return om.MDagPath.getAPathTo(node_object).fullPathName()
+        return om.MFnDependencyNode(node_object).name()
+
+    nodes = cmds.ls(uuid, long=True)
+    if not nodes:
+        cmds.error(f"Node of role '{role}' ({uuid}) no longer exists.")
+        return
+    return nodes[0]
 
 
 def clean_scene(main_joint="main_JNT",
@@ -742,34 +2856,773 @@ def clean_scene(main_joint="main_JNT",
                 module_name="module",
                 asset_name="asset_name"):
 
-    cmds.setAttr(main_joint + ".visibility", 0)
-    cmds.parent(module_name, rig_group)
-    asset_node = get_highest_node_from(module_name)
-    verify_and_rename_node(asset_node, asset_name)
-
-
-def auto_rig_prop():
-    asset_id = query_asset_id_from_task()
-    if asset_id:
-        print(f"Asset ID: {asset_id}")
-        latest_file = get_last_published_alembic(asset_id)
-        print(f"Latest Alembic Cache PublishedFile: {latest_file}")
-        if latest_file["path"]["local_path_windows"]:
-            print(latest_file["path"]["local_path_windows"])
-            import_ma(REFERENCE_PATH)
-            # create_and_set_namespace()
-            clean_path = latest_file["path"]["local_path_windows"].replace(
-                ".abc", ".ma")
-            ma_path = clean_path.replace("_LO", "")
-            ma_path = ma_path.replace("_MI", "")
-            ma_path = ma_path.replace("_HI", "")
-            import_ma(ma_path)
-            bind_all_geo_to_main_joint()
-            name = str(latest_file["code"]).split("_")[1]
-            clean_scene(asset_name=name)
-            success = update_task_status_to_final(asset_id)
-            if success:
-                print("Task status successfully updated to 'final'.")
+    journal = SceneEditJournal()
+    journal.set_attr(main_joint + ".visibility", False)
+    journal.parent(module_name, rig_group)
+
+    # module ends up under rig_group, they share the same root
+    asset_node = get_highest_node_from(rig_group, select=False)
+    referenced = cmds.referenceQuery(asset_node, isNodeReferenced=True)
+    if not referenced:
+        verify_and_rename_node(asset_node, asset_name, journal)
+    journal.commit()
+
+    if referenced:
+        # Referenced nodes cannot be renamed, wrap them in the asset group
+        with preserve_selection():
+            cmds.group(asset_node, name=asset_name)
+
+
+def read_required_plugins(file_path):
+    """
+    Read the plugin requirements from the header of a Maya ASCII file,
+    without opening it in Maya.
+
+    Args:
+        file_path (str): The Maya ASCII file.
+
+    Returns:
+        dict: Plugin -> node types the file creates from it, empty when the
+              plugin is only listed as a requirement.
+    """
+    plugins = {}
+    with open(file_path, errors="replace") as maya_file:
+        for line in maya_file:
+            if line.startswith("createNode"):
+                break
+            if not line.startswith("requires "):
+                continue
+            tokens = shlex.split(line.strip().rstrip(";"))[1:]
+            node_types = []
+            arguments = []
+            while tokens:
+                token = tokens.pop(0)
+                if token == "-nodeType" and tokens:
+                    node_types.append(tokens.pop(0))
+                elif token.startswith("-") and tokens:
+                    tokens.pop(0)
+                else:
+                    arguments.append(token)
+            if arguments and arguments[0] != "maya":
+                plugins.setdefault(arguments[0], []).extend(node_types)
+    return plugins
+
+
+def load_plugin(plugin):
+    """
+    Load a plugin if needed.
+
+    Args:
+        plugin (str): The plugin name.
+
+    Returns:
+        bool: True if the plugin is loaded.
+    """
+    if cmds.pluginInfo(plugin, query=True, loaded=True):
+        return True
+    try:
+        cmds.loadPlugin(plugin, quiet=True)
+        return True
+    except RuntimeError:
+        return False
+
+
+def preflight_auto_rig(plan, job=None, resume=False):
+    """
+    Run every cheap check of a job before any heavy scene work: plugins,
+    files present and readable, free target names.
+
+    Args:
+        plan (dict): The job plan returned by plan_asset.
+        job (RigJob): (Optional) The rig job, the default one otherwise.
+        resume (bool): The job resumes from a checkpoint scene, which
+                       already holds the asset: its name is not checked.
+
+    Returns:
+        list: The problems found, empty when the job can run.
+    """
+    template_path = (job or get_default_rig_job()).template_path
+    problems = []
+    if not os.access(template_path, os.R_OK):
+        problems.append(f"Template '{template_path}' is missing or "
+                        "unreadable.")
+    elif template_path.lower().endswith(".ma"):
+        for plugin, node_types in read_required_plugins(
+                template_path).items():
+            if not node_types:
+                # Only listed by the template, its nodes don't depend on it
+                continue
+            if not load_plugin(plugin):
+                problems.append(f"Plugin '{plugin}' providing {node_types} "
+                                "cannot be loaded.")
+
+    readable = [extension for extension, path
+                in plan["representations"].items()
+                if os.access(path, os.R_OK)]
+    if not readable:
+        problems.append(f"No readable representation of "
+                        f"'{plan['publish_path']}'.")
+    elif rank_representations(readable)[0] == ".abc" and \
+            not load_plugin("AbcImport"):
+        problems.append("Plugin 'AbcImport' cannot be loaded.")
+
+    if not resume and cmds.objExists(plan["asset_name"]):
+        problems.append(f"A node named '{plan['asset_name']}' already "
+                        "exists in the scene.")
+    return problems
+
+
+# Node types created for nodes of plugins missing when a file was opened
+UNKNOWN_NODE_TYPES = ["unknown", "unknownDag", "unknownTransform"]
+
+
+def delete_unknown_nodes():
+    """
+    Delete the unknown nodes of the scene, referenced ones excepted.
+
+    Returns:
+        int: Number of deleted nodes.
+    """
+    nodes = [node for node in cmds.ls(type=UNKNOWN_NODE_TYPES, long=True)
+             if not cmds.referenceQuery(node, isNodeReferenced=True)]
+    if nodes:
+        cmds.lockNode(nodes, lock=False)
+        cmds.delete(nodes)
+    return len(nodes)
+
+
+def remove_unused_plugin_requirements():
+    """
+    Stop the scene from requiring plugins none of its nodes come from:
+    unknown plugins are forgotten, loaded ones stop writing their requires
+    statement. Only plugins registering node types and not in use are
+    dropped, plugins providing data types, translators or attributes only
+    keep their requirement. writeRequires is a session setting, restore it
+    with restore_plugin_requirements once the scene is saved.
+
+    Returns:
+        list: The loaded plugins whose requirement was dropped.
+    """
+    for plugin in cmds.unknownPlugin(query=True, list=True) or []:
+        try:
+            cmds.unknownPlugin(plugin, remove=True)
+        except RuntimeError as e:
+            SCENE_LOGGER.warning("Cannot remove unknown plugin '%s': %s",
+                                 plugin, e)
+
+    # Names and versions of the plugins the scene uses, in one flat list
+    in_use = set(cmds.pluginInfo(query=True, pluginsInUse=True) or [])
+    dropped = []
+    for plugin in cmds.pluginInfo(query=True, listPlugins=True) or []:
+        if plugin in in_use or \
+                not cmds.pluginInfo(plugin, query=True, writeRequires=True):
+            continue
+        node_types = cmds.pluginInfo(plugin, query=True,
+                                     dependNode=True) or []
+        if not node_types or cmds.ls(type=node_types):
+            continue
+        cmds.pluginInfo(plugin, edit=True, writeRequires=False)
+        dropped.append(plugin)
+    return dropped
+
+
+def delete_unused_shading_nodes(nodes):
+    """
+    Delete the shading networks of imported nodes no geometry uses any
+    more, e.g. after consolidate_meshes. Unlike MLdeleteUnused, nodes that
+    don't come from the import are left alone: template nodes may only be
+    connected through message plugs.
+
+    Args:
+        nodes (list): Nodes returned by the geometry import.
+
+    Returns:
+        int: Number of deleted nodes.
+    """
+    imported = set(node for node in cmds.ls(nodes)
+                   if not cmds.referenceQuery(node, isNodeReferenced=True))
+    unused = [engine for engine in cmds.ls(list(imported),
+                                           type="shadingEngine")
+              if not cmds.sets(engine, query=True)]
+    if not unused:
+        return 0
+
+    # Networks shared with a shading group still in use are kept
+    used = [engine for engine in cmds.ls(type="shadingEngine")
+            if engine not in unused]
+    kept = set(cmds.listHistory(used) or []) if used else set()
+    network = set(cmds.listHistory(unused) or [])
+    network.update(cmds.listConnections(unused, type="materialInfo") or [])
+    doomed = [node for node in network
+              if node in imported and node not in kept
+              and not cmds.ls(node, dag=True)]
+    cmds.delete(doomed)
+    return len(doomed)
+
+
+def restore_plugin_requirements(plugins):
+    """
+    Args:
+        plugins (list): Plugins returned by
+                        remove_unused_plugin_requirements.
+    """
+    for plugin in plugins:
+        cmds.pluginInfo(plugin, edit=True, writeRequires=True)
+
+
+def delete_empty_namespaces():
+    """
+    Delete the namespaces left without nodes, nested ones first.
+
+    Returns:
+        list: The deleted namespaces.
+    """
+    namespaces = cmds.namespaceInfo(":", listOnlyNamespaces=True,
+                                    recurse=True, absoluteName=True) or []
+    deleted = []
+    for namespace in sorted(namespaces, key=lambda name: name.count(":"),
+                            reverse=True):
+        if namespace in (":UI", ":shared"):
+            continue
+        if not cmds.namespaceInfo(namespace, listNamespace=True):
+            cmds.namespace(removeNamespace=namespace)
+            deleted.append(namespace)
+    return deleted
+
+
+def time_scene_open(file_path):
+    """
+    Returns:
+        float: Seconds taken to open the scene, which stays open.
+    """
+    start = time.perf_counter()
+    cmds.file(file_path, open=True, force=True)
+    return time.perf_counter() - start
+
+
+def finalize_rig_scene(output_path, nodes=None):
+    """
+    Slim the rig scene down before saving it: unknown nodes, unused plugin
+    requirements, unused shading networks of the imported geometry and
+    empty namespaces are removed.
+
+    The file size is always reported. When the scene logger is at DEBUG
+    level (set_stage_verbosity("scene", logging.DEBUG)), the scene is also
+    saved before slimming and both files are opened, to report the size
+    and open time gained.
+
+    Args:
+        output_path (str): Where to save the rig, as .ma or .mb following
+                           the extension.
+        nodes (list): (Optional) Nodes returned by the geometry import, see
+                      delete_unused_shading_nodes. No shading node is
+                      deleted when omitted.
+
+    Returns:
+        dict: What was removed, and the sizes (bytes) and open times
+              (seconds) measured.
+    """
+    extension = os.path.splitext(output_path)[1].lower()
+    file_type = "mayaAscii" if extension == ".ma" else "mayaBinary"
+    measure = SCENE_LOGGER.isEnabledFor(logging.DEBUG)
+    if measure:
+        handle, unslimmed_path = tempfile.mkstemp(
+            prefix="auto_rig_unslimmed_", suffix=extension)
+        os.close(handle)
+        cmds.file(unslimmed_path, exportAll=True, preserveReferences=True,
+                  type=file_type, force=True)
+
+    report = {"unknown_nodes": delete_unknown_nodes()}
+    report["shading_nodes"] = delete_unused_shading_nodes(nodes) \
+        if nodes else 0
+    report["namespaces"] = delete_empty_namespaces()
+    dropped = remove_unused_plugin_requirements()
+    report["plugin_requirements"] = dropped
+    try:
+        cmds.file(rename=output_path)
+        cmds.file(save=True, type=file_type, force=True)
+    finally:
+        restore_plugin_requirements(dropped)
+    report["size"] = os.path.getsize(output_path)
+    SCENE_LOGGER.info("Rig saved to %s (%.1f MB): removed %d unknown "
+                      "nodes, %d unused shading nodes, %d empty namespaces "
+                      "and the requirements of %s.", output_path,
+                      report["size"] / 1048576.0, report["unknown_nodes"],
+                      report["shading_nodes"], len(report["namespaces"]),
+                      dropped or "no plugin")
+
+    if measure:
+        report["size_before"] = os.path.getsize(unslimmed_path)
+        report["open_seconds_before"] = time_scene_open(unslimmed_path)
+        report["open_seconds"] = time_scene_open(output_path)
+        os.remove(unslimmed_path)
+        SCENE_LOGGER.debug("Rig file %.1f -> %.1f MB, opens in %.2fs "
+                           "instead of %.2fs.",
+                           report["size_before"] / 1048576.0,
+                           report["size"] / 1048576.0,
+                           report["open_seconds"],
+                           report["open_seconds_before"])
+    return report
+
+
+# Point positions are rounded to this many decimals before hashing
+FINGERPRINT_DECIMALS = 5
+
+
+def compute_geometry_fingerprint(meshes):
+    """
+    Hash the topology and point positions of meshes, names excluded, so
+    variants publishing the same geometry under other names share it.
+
+    Args:
+        meshes (list): The mesh transforms.
+
+    Returns:
+        str: The fingerprint, None without NumPy or meshes.
+    """
+    meshes = [mesh for mesh in meshes if is_mesh(mesh)]
+    if not hasNumpy or not meshes:
+        return None
+
+    digests = []
+    for mesh in meshes:
+        selection = om.MSelectionList()
+        selection.add(mesh)
+        counts, connects = om.MFnMesh(
+            selection.getDagPath(0).extendToShape()).getVertices()
+        digest = hashlib.sha1()
+        digest.update(np.array(counts, dtype=np.int32).tobytes())
+        digest.update(np.array(connects, dtype=np.int32).tobytes())
+        # Adding 0.0 turns the -0.0 left by rounding into 0.0
+        points = np.round(get_mesh_points(mesh), FINGERPRINT_DECIMALS) + 0.0
+        digest.update(points.tobytes())
+        digests.append(digest.hexdigest())
+
+    # Sorted, the mesh order depends on the publish, not on the geometry
+    return hashlib.sha1("".join(sorted(digests)).encode()).hexdigest()
+
+
+class RigDedupeIndex(object):
+    """
+    Geometry fingerprint -> rig already built from it, in a SQLite file the
+    hosts of a farm can share (see rig_queue for the file share caveats).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with contextlib.closing(self._connect()) as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS rigs ("
+                "fingerprint TEXT PRIMARY KEY, asset_id INTEGER, "
+                "asset_name TEXT, rig_path TEXT, created_at REAL)")
+            connection.commit()
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=60)
+        connection.row_factory = sqlite3.Row
+        return connection
+
+    def find(self, fingerprint, asset_id=None):
+        """
+        Find a rig built from the same geometry by another asset.
+
+        Args:
+            fingerprint (str): The geometry fingerprint.
+            asset_id (int): (Optional) The asset being rigged, its own rig
+                            is not returned.
+
+        Returns:
+            dict: asset_id, asset_name and rig_path of the rig, None when
+                  there is none or its file is gone.
+        """
+        with contextlib.closing(self._connect()) as connection:
+            row = connection.execute(
+                "SELECT asset_id, asset_name, rig_path FROM rigs "
+                "WHERE fingerprint = ?", (fingerprint,)).fetchone()
+        if row is None or row["asset_id"] == asset_id or \
+                not os.path.exists(row["rig_path"]):
+            return None
+        return dict(row)
+
+    def add(self, fingerprint, asset_id, asset_name, rig_path):
+        """Record the rig built from a geometry, replacing an older one."""
+        with contextlib.closing(self._connect()) as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO rigs VALUES (?, ?, ?, ?, ?)",
+                (fingerprint, asset_id, asset_name, rig_path, time.time()))
+            connection.commit()
+
+    def move(self, old_path, new_path):
+        """Point the rigs recorded at old_path to their moved file."""
+        with contextlib.closing(self._connect()) as connection:
+            connection.execute(
+                "UPDATE rigs SET rig_path = ? WHERE rig_path = ?",
+                (new_path, old_path))
+            connection.commit()
+
+
+def reuse_rig(rig_path, source_name, asset_name, output_path):
+    """
+    Open the rig of an identical asset, give its root the new asset name
+    (the only edit clean_scene would make differently) and save it.
+
+    Args:
+        rig_path (str): The rig file to reuse.
+        source_name (str): The asset name of that rig.
+        asset_name (str): The asset being rigged.
+        output_path (str): Where to save the new rig.
+    """
+    cmds.file(rig_path, open=True, force=True)
+    verify_and_rename_node(source_name, asset_name)
+    file_type = "mayaAscii" if output_path.lower().endswith(".ma") \
+        else "mayaBinary"
+    cmds.file(rename=output_path)
+    cmds.file(save=True, type=file_type, force=True)
+    SCENE_LOGGER.info("Reused the rig of '%s' for '%s'.", source_name,
+                      asset_name)
+
+
+# Stages of auto_rig_prop, in order, as recorded in its checkpoints
+RIG_STAGES = ("plan", "import", "bind", "clean", "finalize", "status")
+
+
+def load_rig_checkpoint(checkpoint_dir, asset_id):
+    """
+    Load the checkpoint of a previous auto_rig_prop run of an asset.
+
+    Args:
+        checkpoint_dir (str): Root directory of the checkpoints, None
+                              disables checkpointing.
+        asset_id (int): The ID of the asset in ShotGrid.
+
+    Returns:
+        dict: The checkpoint, with an empty "completed" stage list when
+              there is nothing to resume.
+    """
+    checkpoint = {"directory": None, "completed": []}
+    if not checkpoint_dir:
+        return checkpoint
+
+    checkpoint["directory"] = os.path.join(checkpoint_dir, str(asset_id))
+    state_path = os.path.join(checkpoint["directory"], "checkpoint.json")
+    if os.path.exists(state_path):
+        with open(state_path) as state_file:
+            checkpoint.update(json.load(state_file))
+    return checkpoint
+
+
+def save_rig_checkpoint(checkpoint, stage, save_scene=False):
+    """
+    Record a completed stage, optionally with the current scene. Nothing is
+    written when checkpointing is disabled.
+
+    Args:
+        checkpoint (dict): The checkpoint returned by load_rig_checkpoint.
+        stage (str): The completed stage, one of RIG_STAGES.
+        save_scene (bool): Export the scene so a retry resumes from it.
+    """
+    # Tracked in memory too, later stages check it even without directory
+    checkpoint["completed"].append(stage)
+    if not checkpoint["directory"]:
+        return
+    os.makedirs(checkpoint["directory"], exist_ok=True)
+
+    if save_scene:
+        scene_path = os.path.join(checkpoint["directory"], f"{stage}.mb")
+        # Export rather than save so the open scene keeps its name
+        cmds.file(scene_path, exportAll=True, preserveReferences=True,
+                  type="mayaBinary", force=True)
+        checkpoint["scene"] = scene_path
+
+    state_path = os.path.join(checkpoint["directory"], "checkpoint.json")
+    with open(state_path + ".tmp", "w") as state_file:
+        json.dump({key: value for key, value in checkpoint.items()
+                   if key != "directory"}, state_file, indent=4)
+    os.replace(state_path + ".tmp", state_path)
+    LOGGER.debug("Checkpoint after stage '%s' saved.", stage)
+
+
+def clear_rig_checkpoint(checkpoint):
+    """
+    Delete the checkpoint of a finished run. A scene opened from the
+    checkpoint is renamed first, a save would otherwise write into the
+    deleted directory.
+
+    Args:
+        checkpoint (dict): The checkpoint returned by load_rig_checkpoint.
+    """
+    directory = checkpoint["directory"]
+    if not directory or not os.path.isdir(directory):
+        return
+    scene_name = cmds.file(query=True, sceneName=True)
+    if scene_name:
+        scene_name = os.path.normcase(os.path.abspath(scene_name))
+        directory_prefix = os.path.join(
+            os.path.normcase(os.path.abspath(directory)), "")
+        if scene_name.startswith(directory_prefix):
+            cmds.file(rename="untitled")
+    shutil.rmtree(directory, ignore_errors=True)
+
+
+def auto_rig_prop(geometry_mode="import", self_contained=False,
+                  interactive=None, asset_id=None, registry=None,
+                  checkpoint_dir=None, job=None, all_lods=False,
+                  consolidate=False, sanitize=True, output_path=None,
+                  dedupe_index=None):
+    """
+    Rig the prop of the current ShotGrid task.
+
+    Args:
+        geometry_mode (str): "import" to bring the geometry into the rig file,
+                             "reference" to bind through a reference of the
+                             geometry publish and keep the rig file light.
+        self_contained (bool): The pipeline needs a rig file without
+                               references, forces the "import" mode.
+        interactive (bool): Select the rigged asset at the end, defaults to
+                            False in batch mode. No other stage touches the
+                            selection.
+        asset_id (int): (Optional) Asset to rig instead of the one of the
+                        current task.
+        registry (dict): (Optional) Registry of a template already in the
+                         scene (see build_node_registry), the template
+                         import is skipped.
+        checkpoint_dir (str): (Optional) Persist the plan and the scene
+                              after each stage there, a retry of the same
+                              asset then resumes after the last completed
+                              stage.
+        job (RigJob): (Optional) ShotGrid connection, project, template and
+                      naming of the run, the default job otherwise.
+        all_lods (bool): Import every published LOD (_LO, _MI, _HI), bind
+                         one of them (see get_source_lod) and transfer its
+                         weights to the others.
+        consolidate (bool): Combine the imported meshes sharing the same
+                            shading groups before the bind (see
+                            consolidate_meshes), ignored for referenced
+                            geometry.
+        sanitize (bool): Bake the construction history and delete the
+                         orphan intermediate shapes of the imported meshes
+                         before the bind (see sanitize_geometry), ignored
+                         for referenced geometry.
+        output_path (str): (Optional) Slim the rig scene down and save it
+                           there once cleaned (see finalize_rig_scene). The
+                           open scene is left as is when omitted.
+        dedupe_index (str): (Optional) SQLite file of a RigDedupeIndex.
+                            When another asset with the same geometry was
+                            already rigged, its rig is renamed and saved
+                            to output_path instead of binding again. Needs
+                            output_path, ignored for referenced geometry.
+
+    Returns:
+        str: Name of the rigged asset, None if nothing was rigged.
+    """
+    if geometry_mode not in ("import", "reference"):
+        cmds.error(f"Unknown geometry mode '{geometry_mode}'.")
+        return
+    reference = geometry_mode == "reference" and not self_contained
+    job = job or get_default_rig_job()
+    if interactive is None:
+        interactive = not cmds.about(batch=True)
+
+    if asset_id is None:
+        asset_id = query_asset_id_from_task(job)
+    if not asset_id:
+        return None
+    LOGGER.info("Asset ID: %s", asset_id)
+
+    checkpoint = load_rig_checkpoint(checkpoint_dir, asset_id)
+
+    # Resolve and check everything before the first import, a resumed run
+    # too: the plugins are not loaded in a fresh session and the asset may
+    # have been published again since the checkpoint
+    try:
+        plan = plan_asset(asset_id, job)
+    except RuntimeError as e:
+        cmds.error(f"Asset {asset_id} cannot be rigged: {e}")
+        return
+    if "plan" in checkpoint["completed"] and \
+            checkpoint["plan"]["published_file_id"] != \
+            plan["published_file_id"]:
+        LOGGER.warning("Asset %s was published again since its checkpoint, "
+                       "starting over.", asset_id)
+        clear_rig_checkpoint(checkpoint)
+        checkpoint = load_rig_checkpoint(checkpoint_dir, asset_id)
+    completed = checkpoint["completed"]
+    resume = bool(checkpoint.get("scene"))
+    problems = preflight_auto_rig(plan, job, resume=resume)
+    if problems:
+        cmds.error(f"Preflight failed for asset {asset_id}:\n"
+                   + "\n".join(problems))
+        return
+    if "plan" not in completed:
+        checkpoint["plan"] = plan
+        save_rig_checkpoint(checkpoint, "plan")
+    publish_path = plan["publish_path"]
+    name = plan["asset_name"]
+    LOGGER.info("Publish: %s", publish_path)
+
+    if resume:
+        if interactive and cmds.file(query=True, modified=True) and \
+                cmds.confirmDialog(
+                    title="Resume rig",
+                    message="Discard the unsaved changes of the scene to "
+                            f"resume asset {asset_id}?",
+                    button=["Discard", "Cancel"], defaultButton="Cancel",
+                    cancelButton="Cancel",
+                    dismissString="Cancel") != "Discard":
+            LOGGER.warning("Resume of asset %s cancelled.", asset_id)
+            return None
+        LOGGER.info("Resuming asset %s after stage '%s'.", asset_id,
+                    completed[-1])
+        cmds.file(checkpoint["scene"], open=True, force=True)
+        # Handles died with the previous scene, roles resolve by UUID
+        registry = {role: (uuid, om.MObjectHandle())
+                    for role, uuid in checkpoint["registry"].items()}
+        geo_nodes = cmds.ls(checkpoint["geometry"], long=True) \
+            if checkpoint["geometry"] else []
+        lod_nodes = cmds.ls(checkpoint["lod_geometry"], long=True) \
+            if checkpoint.get("lod_geometry") else []
+
+    with scene_query_cache():
+        if "import" not in completed:
+            if registry is None:
+                template_nodes = import_ma(job.template_path)
+                registry = build_node_registry(template_nodes,
+                                               job.template_roles)
             else:
-                print("Failed to update task status.")
-            cmds.select(name)
+                registry = dict(registry)
+            # create_and_set_namespace()
+            lods = plan.get("lods", {}) if all_lods else {}
+            source_lod = get_source_lod(publish_path, lods)
+            _, geo_nodes = import_best_representation(
+                publish_path, reference, job.geometry_namespace,
+                lods.get(source_lod))
+            build_node_registry(geo_nodes, job.geometry_roles, registry)
+            lod_nodes = []
+            for lod, representations in lods.items():
+                if lod != source_lod:
+                    # Own namespace, the LOD hierarchies share their names
+                    lod_namespace = f"{job.geometry_namespace}_{lod}"
+                    lod_nodes.extend(import_best_representation(
+                        publish_path, reference, lod_namespace,
+                        representations, lod_namespace)[1])
+            checkpoint["registry"] = {
+                role: uuid for role, (uuid, _) in registry.items()}
+            checkpoint["geometry"] = cmds.ls(geo_nodes, uuid=True) \
+                if geo_nodes else []
+            checkpoint["lod_geometry"] = cmds.ls(lod_nodes, uuid=True) \
+                if lod_nodes else []
+            # read_publish_sidecar checked it against the publish files,
+            # the mesh count only catches a partial import
+            sidecar = plan.get("sidecar")
+            if sidecar:
+                mesh_count = len([node for node
+                                  in get_geo_from_nodes(geo_nodes)
+                                  if is_mesh(node)])
+                if sidecar["mesh_count"] == mesh_count:
+                    checkpoint["bounds"] = sidecar["bounds"]
+                else:
+                    IMPORT_LOGGER.info("Publish sidecar describes %d meshes, "
+                                       "%d imported: measuring the "
+                                       "geometry.", sidecar["mesh_count"],
+                                       mesh_count)
+            if dedupe_index and output_path and not reference:
+                checkpoint["fingerprint"] = compute_geometry_fingerprint(
+                    get_geo_from_nodes(geo_nodes + lod_nodes))
+            save_rig_checkpoint(checkpoint, "import", save_scene=True)
+
+        fingerprint = checkpoint.get("fingerprint")
+        dedupe = RigDedupeIndex(dedupe_index) if fingerprint else None
+        reused = dedupe.find(fingerprint, asset_id) \
+            if dedupe and "bind" not in completed else None
+        if reused:
+            reuse_rig(reused["rig_path"], reused["asset_name"], name,
+                      output_path)
+            checkpoint["scene"] = output_path
+            for stage in ("bind", "clean", "finalize"):
+                save_rig_checkpoint(checkpoint, stage)
+
+        if "bind" not in completed:
+            if sanitize and not reference:
+                geo_nodes, _ = sanitize_geometry(geo_nodes)
+                if lod_nodes:
+                    lod_nodes, _ = sanitize_geometry(lod_nodes)
+            consolidated = consolidate and not reference
+            if consolidated:
+                meshes = [node for node in get_geo_from_nodes(geo_nodes)
+                          if is_mesh(node)]
+                evaluation_before = measure_unbound_evaluation(
+                    resolve_node(registry, "main_joint"), meshes)
+                mesh_count_before = len(meshes)
+                geo_nodes, _ = consolidate_meshes(geo_nodes)
+            checkpoint["geometry"] = cmds.ls(geo_nodes, uuid=True) \
+                if geo_nodes else []
+            bind_all_geo_to_main_joint(
+                resolve_node(registry, "main_joint"),
+                resolve_node(registry, "local_controller"),
+                resolve_node(registry, "global_controller"),
+                nodes=geo_nodes, select=False,
+                bounds=checkpoint.get("bounds"))
+            if consolidated:
+                meshes = [node for node in get_geo_from_nodes(geo_nodes)
+                          if is_mesh(node)]
+                evaluation = measure_rig_evaluation(
+                    resolve_node(registry, "main_joint"), meshes)
+                if evaluation and evaluation_before is not None:
+                    BIND_LOGGER.info("Rig evaluation: %.2f ms per pose for "
+                                     "%d meshes, %.2f ms for %d once "
+                                     "consolidated (%.1fx).",
+                                     evaluation_before, mesh_count_before,
+                                     evaluation, len(meshes),
+                                     evaluation_before / evaluation)
+            if lod_nodes:
+                transfer_skin_weights(get_geo_from_nodes(geo_nodes),
+                                      get_geo_from_nodes(lod_nodes))
+            save_rig_checkpoint(checkpoint, "bind", save_scene=True)
+
+        if "clean" not in completed:
+            clean_scene(main_joint=resolve_node(registry, "main_joint"),
+                        rig_group=resolve_node(registry, "rig_group"),
+                        module_name=resolve_node(registry, "module"),
+                        asset_name=name)
+            lod_roots = cmds.ls(lod_nodes, assemblies=True, long=True) \
+                if lod_nodes else []
+            if lod_roots:
+                with preserve_selection():
+                    cmds.parent(lod_roots, name)
+            save_rig_checkpoint(checkpoint, "clean", save_scene=True)
+
+        if output_path and "finalize" not in completed:
+            finalize_rig_scene(output_path, geo_nodes + lod_nodes)
+            if dedupe:
+                dedupe.add(fingerprint, asset_id, name, output_path)
+            checkpoint["scene"] = output_path
+            save_rig_checkpoint(checkpoint, "finalize")
+
+    success = update_task_status_to_final(asset_id, job)
+    if success:
+        LOGGER.info("Task status successfully updated to 'final'.")
+        clear_rig_checkpoint(checkpoint)
+    else:
+        # The checkpoint stays, a retry only updates the status
+        LOGGER.error("Failed to update task status.")
+    if interactive:
+        cmds.select(name)
+    return name
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Check which assets auto_rig_prop can rig, without Maya.")
+    parser.add_argument("asset_ids", nargs="+", type=int)
+    parser.add_argument("--report", help="Write the plan to this JSON file.")
+    parser.add_argument("--workers", type=int, default=8)
+    arguments = parser.parse_args()
+
+    job_plans, job_failures = plan_auto_rig(arguments.asset_ids,
+                                            arguments.workers)
+    for failure in job_failures:
+        LOGGER.error("Asset %s: %s", failure["asset_id"], failure["reason"])
+    if arguments.report:
+        write_plan_report(job_plans, job_failures, arguments.report)
@@ -0,0 +1,51 @@
+"""
+Maya plug-in registering autoRigApplyModifier, the command auto_rig_script
+runs its API modifiers through so they land on the undo queue.
+
+auto_rig_script loads it on demand with apply_modifier, it does not need to
+be on MAYA_PLUG_IN_PATH.
+"""
+import maya.api.OpenMaya as om
+
+maya_useNewAPI = True
+
+# Filled by auto_rig_script.apply_modifier right before the command runs
+PENDING_MODIFIERS = []
+
+
+class ApplyModifierCommand(om.MPxCommand):
+    """Applies the pending modifier, undo and redo replay it."""
+
+    name = "autoRigApplyModifier"
+
+    def __init__(self):
+        super(ApplyModifierCommand, self).__init__()
+        self.modifier = None
+
+    @staticmethod
+    def creator():
+        return ApplyModifierCommand()
+
+    def doIt(self, args):
+        if not PENDING_MODIFIERS:
+            raise RuntimeError(f"{self.name} has no modifier to apply.")
+        self.modifier = PENDING_MODIFIERS.pop()
+        self.modifier.doIt()
+
+    def redoIt(self):
+        self.modifier.doIt()
+
+    def undoIt(self):
+        self.modifier.undoIt()
+
+    def isUndoable(self):
+        return True
+
+
+def initializePlugin(plugin):
+    om.MFnPlugin(plugin, "auto_rig_prop").registerCommand(
+        ApplyModifierCommand.name, ApplyModifierCommand.creator)
+
+
+def uninitializePlugin(plugin):
+    om.MFnPlugin(plugin).deregisterCommand(ApplyModifierCommand.name)
@@ -0,0 +1,486 @@
+"""
+Job queue shared by several farm machines through one SQLite file.
+
+Jobs are leased to a consumer for a limited time, kept alive by heartbeats
+and handed to another consumer when a lease expires (crashed host). Failed
+jobs are retried up to max_attempts, and completing a job twice is a no-op.
+SQLite locking needs a share that honours file locks (SMB with oplocks
+disabled, or NFS with a lock daemon).
+
+Fill the queue:
+    python rig_queue.py //server/rigs/queue.db enqueue 1234 1235 1236
+
+Or estimate each job first, so the longest ones start first and only run on
+hosts with enough memory:
+    python rig_queue.py //server/rigs/queue.db enqueue --estimate 1234 1235
+
+Consume it on every farm machine. The command supervises consumers running
+a warm rig_worker session under mayapy, and starts a new one each time the
+previous recycles its worker (exit code 75):
+    python rig_queue.py //server/rigs/queue.db consume --output-dir D:/rigs
+"""
+import argparse
+import json
+import logging
+import os
+import socket
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+
+DEFAULT_LEASE_SECONDS = 15 * 60
+DEFAULT_HEARTBEAT_SECONDS = 30
+DEFAULT_MAX_ATTEMPTS = 3
+
+QUEUE_LOGGER = logging.getLogger("auto_rig_prop").getChild("queue")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    asset_id INTEGER PRIMARY KEY,
+    options TEXT NOT NULL DEFAULT '{}',
+    state TEXT NOT NULL DEFAULT 'pending',
+    priority REAL NOT NULL DEFAULT 0,
+    memory_mb REAL NOT NULL DEFAULT 0,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_owner TEXT,
+    lease_expires REAL,
+    result TEXT,
+    error TEXT,
+    updated_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_claim ON jobs (state, priority);
+"""
+
+# Columns added after the first release: name -> definition
+MIGRATIONS = {
+    "memory_mb": "REAL NOT NULL DEFAULT 0",
+}
+
+
+def get_consumer_id():
+    """
+    Returns:
+        str: Identifies this process across the farm (host:pid).
+    """
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class RigJobQueue(object):
+    """
+    SQLite-backed queue of auto_rig_prop jobs, one job per asset ID.
+
+    Every state change runs in its own short transaction, so several hosts
+    can enqueue, claim and complete jobs on the same file concurrently.
+    """
+
+    def __init__(self, path, lease_seconds=DEFAULT_LEASE_SECONDS,
+                 max_attempts=DEFAULT_MAX_ATTEMPTS):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        connection = sqlite3.connect(self.path, timeout=60)
+        try:
+            connection.executescript(SCHEMA)
+            columns = {row[1] for row in connection.execute(
+                "PRAGMA table_info(jobs)")}
+            for column, definition in MIGRATIONS.items():
+                if column not in columns:
+                    connection.execute(
+                        f"ALTER TABLE jobs ADD COLUMN {column} {definition}")
+            connection.commit()
+        finally:
+            connection.close()
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=60,
+                                     isolation_level=None)
+        connection.row_factory = sqlite3.Row
+        return _Transaction(connection)
+
+    def enqueue(self, asset_id, priority=0, force=False, memory_mb=0,
+                **options):
+        """
+        Add a job, ignored when the asset is already queued.
+
+        Args:
+            asset_id (int): The ID of the asset in ShotGrid.
+            priority (float): Jobs with a higher priority are claimed first.
+            force (bool): Queue the asset again even if it was done or
+                          failed (not while it is running).
+            memory_mb (float): Memory the job needs, only consumers with
+                               that much memory claim it.
+            **options: Passed to the worker (geometry_mode, output_path...).
+
+        Returns:
+            bool: True if the job was (re)queued.
+        """
+        with self._connect() as connection:
+            cursor = connection.execute(
+                "INSERT OR IGNORE INTO jobs (asset_id, options, priority, "
+                "memory_mb, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (asset_id, json.dumps(options), priority, memory_mb,
+                 time.time()))
+            if cursor.rowcount or not force:
+                return bool(cursor.rowcount)
+            cursor = connection.execute(
+                "UPDATE jobs SET state = 'pending', options = ?, "
+                "priority = ?, memory_mb = ?, attempts = 0, error = NULL, "
+                "result = NULL, updated_at = ? "
+                "WHERE asset_id = ? AND state != 'running'",
+                (json.dumps(options), priority, memory_mb, time.time(),
+                 asset_id))
+            return bool(cursor.rowcount)
+
+    def claim(self, owner, max_memory_mb=None):
+        """
+        Lease the next job to a consumer.
+
+        Args:
+            owner (str): The consumer ID.
+            max_memory_mb (float): (Optional) Memory of the consumer, jobs
+                                   needing more are left to bigger hosts.
+
+        Returns:
+            dict: asset_id, attempts and the job options, None when nothing
+                  is left to do.
+        """
+        now = time.time()
+        with self._connect() as connection:
+            # Expired leases of exhausted jobs are not retried
+            connection.execute(
+                "UPDATE jobs SET state = 'failed', lease_owner = NULL, "
+                "error = 'Lease expired.', updated_at = ? "
+                "WHERE state = 'running' AND lease_expires < ? "
+                "AND attempts >= ?", (now, now, self.max_attempts))
+            row = connection.execute(
+                "SELECT asset_id, options, attempts FROM jobs "
+                "WHERE (state = 'pending' "
+                "OR (state = 'running' AND lease_expires < ?)) "
+                "AND (? IS NULL OR memory_mb <= ?) "
+                "ORDER BY priority DESC, asset_id LIMIT 1",
+                (now, max_memory_mb, max_memory_mb)).fetchone()
+            if row is None:
+                return None
+            connection.execute(
+                "UPDATE jobs SET state = 'running', lease_owner = ?, "
+                "lease_expires = ?, attempts = attempts + 1, updated_at = ? "
+                "WHERE asset_id = ?",
+                (owner, now + self.lease_seconds, now, row["asset_id"]))
+        return dict(json.loads(row["options"]), asset_id=row["asset_id"],
+                    attempts=row["attempts"] + 1)
+
+    def heartbeat(self, asset_id, owner):
+        """
+        Extend the lease of a running job.
+
+        Returns:
+            bool: False when the lease was lost to another consumer.
+        """
+        now = time.time()
+        with self._connect() as connection:
+            cursor = connection.execute(
+                "UPDATE jobs SET lease_expires = ?, updated_at = ? "
+                "WHERE asset_id = ? AND lease_owner = ? "
+                "AND state = 'running'",
+                (now + self.lease_seconds, now, asset_id, owner))
+            return cursor.rowcount == 1
+
+    def complete(self, asset_id, owner, result=None):
+        """
+        Mark a leased job as done. Completing it again, or after the lease
+        moved to another consumer, changes nothing.
+
+        Returns:
+            bool: True if this call completed the job.
+        """
+        with self._connect() as connection:
+            cursor = connection.execute(
+                "UPDATE jobs SET state = 'done', result = ?, error = NULL, "
+                "lease_owner = NULL, updated_at = ? "
+                "WHERE asset_id = ? AND lease_owner = ? "
+                "AND state = 'running'",
+                (json.dumps(result), time.time(), asset_id, owner))
+            return cursor.rowcount == 1
+
+    def fail(self, asset_id, owner, error):
+        """
+        Release a leased job after a failure, it goes back to pending until
+        max_attempts is reached.
+
+        Returns:
+            bool: True if the job will be retried.
+        """
+        with self._connect() as connection:
+            cursor = connection.execute(
+                "UPDATE jobs SET state = CASE WHEN attempts < ? "
+                "THEN 'pending' ELSE 'failed' END, error = ?, "
+                "lease_owner = NULL, updated_at = ? "
+                "WHERE asset_id = ? AND lease_owner = ? "
+                "AND state = 'running'",
+                (self.max_attempts, str(error), time.time(), asset_id,
+                 owner))
+            if not cursor.rowcount:
+                return False
+            state = connection.execute(
+                "SELECT state FROM jobs WHERE asset_id = ?",
+                (asset_id,)).fetchone()["state"]
+            return state == "pending"
+
+    def status(self):
+        """
+        Returns:
+            dict: Number of jobs per state.
+        """
+        with self._connect() as connection:
+            rows = connection.execute(
+                "SELECT state, COUNT(*) AS count FROM jobs GROUP BY state")
+            return {row["state"]: row["count"] for row in rows}
+
+
+def enqueue_plans(queue, plans, force=False, **options):
+    """
+    Queue planned jobs longest first: the estimated duration of each job is
+    its priority, and its estimated memory routes it to big enough hosts.
+
+    Args:
+        queue (RigJobQueue): The shared queue.
+        plans (list): Plans returned by auto_rig_script.plan_auto_rig.
+        force (bool): Queue done or failed assets again.
+        **options: Passed to the worker (geometry_mode, output_path...).
+
+    Returns:
+        int: Number of jobs (re)queued.
+    """
+    queued = 0
+    for plan in plans:
+        cost = plan["cost"]
+        queued += queue.enqueue(plan["asset_id"], priority=cost["seconds"],
+                                force=force, memory_mb=cost["memory_mb"],
+                                **options)
+    return queued
+
+
+class _Transaction(object):
+    """Runs a connection's statements in one IMMEDIATE transaction."""
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        self.connection.execute("BEGIN IMMEDIATE")
+        return self.connection
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            self.connection.execute(
+                "ROLLBACK" if exc_type else "COMMIT")
+        finally:
+            self.connection.close()
+
+
+class Heartbeat(threading.Thread):
+    """Keeps a job lease alive while the job runs."""
+
+    def __init__(self, queue, asset_id, owner,
+                 interval=DEFAULT_HEARTBEAT_SECONDS):
+        super(Heartbeat, self).__init__(daemon=True)
+        self.queue = queue
+        self.asset_id = asset_id
+        self.owner = owner
+        self.interval = interval
+        self.lost = False
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            if not self.queue.heartbeat(self.asset_id, self.owner):
+                self.lost = True
+                return
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+
+def consume(queue, worker, output_dir=None, idle_seconds=60,
+            max_memory_mb=None):
+    """
+    Claim and run jobs until the queue stays empty for idle_seconds or the
+    worker must be recycled.
+
+    Args:
+        queue (RigJobQueue): The shared queue.
+        worker (rig_worker.RigWorker): A started worker.
+        output_dir (str): (Optional) Save each rig there as
+                          <asset_id>_rig.mb, unless the job has its own
+                          output_path. The rig is written under a name of
+                          its own and only moved to output_path while this
+                          consumer still holds the job lease.
+        idle_seconds (float): How long to wait for new jobs before leaving.
+        max_memory_mb (float): (Optional) Memory of this host, bigger jobs
+                               are left to other consumers.
+
+    Returns:
+        int: Number of jobs processed.
+    """
+    owner = get_consumer_id()
+    processed = 0
+    idle_since = time.time()
+    while not worker.should_recycle():
+        job = queue.claim(owner, max_memory_mb)
+        if job is None:
+            if time.time() - idle_since > idle_seconds:
+                break
+            time.sleep(5)
+            continue
+
+        if output_dir and "output_path" not in job:
+            job["output_path"] = os.path.join(
+                output_dir, f"{job['asset_id']}_rig.mb")
+        output_path = job.get("output_path")
+        if output_path:
+            job["output_path"] = get_staging_path(output_path, owner)
+
+        heartbeat = Heartbeat(queue, job["asset_id"], owner)
+        heartbeat.start()
+        try:
+            result = worker.run_job(job)
+        finally:
+            heartbeat.stop()
+        processed += 1
+        idle_since = time.time()
+
+        staging_path = job.get("output_path")
+        if heartbeat.lost or not queue.heartbeat(job["asset_id"], owner):
+            # Another consumer re-claimed the job, its run owns the result
+            QUEUE_LOGGER.warning("Lost the lease of asset %s, result "
+                                 "discarded.", job["asset_id"])
+            discard_file(staging_path)
+            continue
+
+        if result["status"] == "done":
+            if staging_path and os.path.exists(staging_path):
+                os.replace(staging_path, output_path)
+                if job.get("dedupe_index"):
+                    worker.rig.RigDedupeIndex(job["dedupe_index"]).move(
+                        staging_path, output_path)
+                result["output_path"] = output_path
+            queue.complete(job["asset_id"], owner, result)
+        else:
+            discard_file(staging_path)
+            queue.fail(job["asset_id"], owner, result.get("error"))
+    return processed
+
+
+def get_staging_path(output_path, owner):
+    """
+    Returns:
+        str: Where a consumer writes a rig before it is moved to
+             output_path, unique per consumer.
+    """
+    root, extension = os.path.splitext(output_path)
+    safe_owner = "".join(character if character.isalnum() else "_"
+                         for character in owner)
+    return f"{root}.{safe_owner}.partial{extension}"
+
+
+def discard_file(path):
+    """Delete a file if it exists, path may be None."""
+    if path and os.path.exists(path):
+        os.remove(path)
+
+
+def supervise(mayapy, consumer_arguments):
+    """
+    Run consumers one after the other, starting a new one each time the
+    previous recycles its worker.
+
+    Args:
+        mayapy (str): Path to the mayapy executable.
+        consumer_arguments (list): Command line of the consumer, after the
+                                   path of this script.
+
+    Returns:
+        int: Exit code of the last consumer when it did not recycle.
+    """
+    import rig_worker
+
+    command = [mayapy, os.path.abspath(__file__)] + consumer_arguments
+    while True:
+        return_code = subprocess.call(command)
+        if return_code != rig_worker.RECYCLE_EXIT_CODE:
+            return return_code
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Shared auto_rig_prop job queue.")
+    parser.add_argument("queue", help="Path of the SQLite queue file.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    enqueue = commands.add_parser("enqueue", help="Queue assets.")
+    enqueue.add_argument("asset_ids", nargs="+", type=int)
+    enqueue.add_argument("--force", action="store_true",
+                         help="Queue done or failed assets again.")
+    enqueue.add_argument("--geometry-mode", default="import")
+    enqueue.add_argument("--estimate", action="store_true",
+                         help="Plan the assets and queue the longest jobs "
+                              "first, with their memory needs.")
+    commands.add_parser("status", help="Count the jobs per state.")
+    consumer = commands.add_parser("consume", help="Run jobs.")
+    consumer.add_argument("--run", action="store_true",
+                          help="Run the consumer in this (mayapy) process "
+                               "instead of supervising consumers.")
+    consumer.add_argument("--mayapy", default="mayapy",
+                          help="mayapy executable used by the supervisor.")
+    consumer.add_argument("--output-dir")
+    consumer.add_argument("--max-jobs", type=int, default=50)
+    consumer.add_argument("--max-memory", type=float, default=None)
+    consumer.add_argument("--idle", type=float, default=60)
+    consumer.add_argument("--memory", type=float, default=None,
+                          help="Memory of this host (MB), bigger jobs are "
+                               "left to other hosts.")
+    arguments = parser.parse_args()
+
+    queue = RigJobQueue(arguments.queue)
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    if arguments.command == "enqueue" and arguments.estimate:
+        import auto_rig_script
+
+        plans, failures = auto_rig_script.plan_auto_rig(arguments.asset_ids)
+        for failure in failures:
+            print(f"Asset {failure['asset_id']}: {failure['reason']}")
+        queued = enqueue_plans(queue, plans, force=arguments.force,
+                               geometry_mode=arguments.geometry_mode)
+        print(f"Queued {queued} of {len(arguments.asset_ids)} assets.")
+        return 0
+    if arguments.command == "enqueue":
+        queued = sum(queue.enqueue(asset_id, force=arguments.force,
+                                   geometry_mode=arguments.geometry_mode)
+                     for asset_id in arguments.asset_ids)
+        print(f"Queued {queued} of {len(arguments.asset_ids)} assets.")
+        return 0
+    if arguments.command == "status":
+        print(json.dumps(queue.status(), indent=4))
+        return 0
+
+    if not arguments.run:
+        return supervise(arguments.mayapy, sys.argv[1:] + ["--run"])
+
+    import rig_worker
+
+    worker = rig_worker.RigWorker(arguments.max_jobs, arguments.max_memory)
+    worker.start()
+    try:
+        consume(queue, worker, arguments.output_dir, arguments.idle,
+                arguments.memory)
+        if worker.should_recycle():
+            return rig_worker.RECYCLE_EXIT_CODE
+        return 0
+    finally:
+        worker.stop()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
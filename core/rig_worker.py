@@ -0,0 +1,312 @@
+"""
+Long-lived mayapy worker that keeps the plugins and the rig template loaded
+between auto_rig_prop jobs.
+
+Start a worker (restarted automatically when it recycles itself):
+    python rig_worker.py --mayapy "C:/.../Maya2025/bin/mayapy.exe"
+
+Submit a job from any Python interpreter:
+    from rig_worker import submit_rig_job
+    submit_rig_job(1234, output_path="D:/rigs/chair_rig.mb")
+"""
+import argparse
+import os
+import secrets
+import subprocess
+import sys
+import tempfile
+import time
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+
+DEFAULT_ADDRESS = ("localhost", 50007)
+
+# Jobs are unpickled by the worker, only clients knowing this key may send
+# them. AUTO_RIG_WORKER_KEY overrides the per-user key file.
+AUTHKEY_ENVIRONMENT = "AUTO_RIG_WORKER_KEY"
+AUTHKEY_PATH = os.path.join(os.path.expanduser("~"), ".auto_rig_worker_key")
+
+# Exit code of a worker asking its supervisor for a fresh process
+RECYCLE_EXIT_CODE = 75
+
+# Plugins loaded once at startup, on top of the template requirements
+WORKER_PLUGINS = ("AbcImport",)
+
+hasPsutil = False
+try:
+    import psutil
+
+    hasPsutil = True
+except ImportError:
+    pass
+
+
+def get_authkey(create=False):
+    """
+    Read the key authenticating the clients of the workers.
+
+    Args:
+        create (bool): Generate a random key in AUTHKEY_PATH, readable by the
+                       current user only, when there is none yet.
+
+    Returns:
+        bytes: The key.
+
+    Raises:
+        RuntimeError: When no key is set and create is False.
+    """
+    key = os.environ.get(AUTHKEY_ENVIRONMENT)
+    if key:
+        return key.encode()
+    if create and not os.path.exists(AUTHKEY_PATH):
+        try:
+            handle = os.open(AUTHKEY_PATH,
+                             os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        except FileExistsError:
+            pass
+        else:
+            with os.fdopen(handle, "w") as key_file:
+                key_file.write(secrets.token_hex(32))
+    try:
+        with open(AUTHKEY_PATH) as key_file:
+            return key_file.read().strip().encode()
+    except FileNotFoundError:
+        raise RuntimeError(f"No worker key: set {AUTHKEY_ENVIRONMENT} or "
+                           f"start a worker to create {AUTHKEY_PATH}.")
+
+
+def get_memory_usage_mb():
+    """
+    Returns:
+        float: Resident memory of the current process in MB, None when
+               psutil is not installed.
+    """
+    if not hasPsutil:
+        return None
+    return psutil.Process().memory_info().rss / (1024 * 1024)
+
+
+class RigWorker(object):
+    """
+    Runs auto_rig_prop jobs in one Maya session.
+
+    The plugins are loaded and the template imported once, then saved as a
+    binary snapshot. Every job starts by reopening that snapshot, which
+    gives a clean scene with the template already in place.
+    """
+
+    def __init__(self, max_jobs=50, max_memory_mb=None, rig_job=None):
+        """
+        Args:
+            max_jobs (int): Jobs run before the worker asks to recycle.
+            max_memory_mb (float): Memory threshold before it recycles.
+            rig_job (auto_rig_script.RigJob): (Optional) ShotGrid
+                                              connection, template and
+                                              naming of the jobs, created
+                                              from the current context
+                                              otherwise.
+        """
+        self.max_jobs = max_jobs
+        self.max_memory_mb = max_memory_mb
+        self.rig_job = rig_job
+        self.jobs_done = 0
+        self.snapshot_path = None
+        self.registry = None
+        self.rig = None
+
+    def start(self):
+        """Initialize Maya, load the plugins and snapshot the template."""
+        import maya.standalone
+
+        maya.standalone.initialize(name="python")
+
+        # Needs maya.standalone to be initialized first
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        import auto_rig_script
+
+        self.rig = auto_rig_script
+        if self.rig_job is None:
+            self.rig_job = auto_rig_script.RigJob.from_current_context()
+        cmds = auto_rig_script.cmds
+        plugins = list(WORKER_PLUGINS)
+        plugins.extend(
+            auto_rig_script.read_required_plugins(
+                self.rig_job.template_path))
+        for plugin in plugins:
+            if not auto_rig_script.load_plugin(plugin):
+                auto_rig_script.LOGGER.warning(
+                    "Worker could not load plugin '%s'.", plugin)
+
+        cmds.file(new=True, force=True)
+        template_nodes = auto_rig_script.import_ma(
+            self.rig_job.template_path)
+        self.registry = auto_rig_script.build_node_registry(
+            template_nodes, self.rig_job.template_roles)
+
+        handle, self.snapshot_path = tempfile.mkstemp(
+            prefix="auto_rig_template_", suffix=".mb")
+        os.close(handle)
+        cmds.file(rename=self.snapshot_path)
+        cmds.file(save=True, type="mayaBinary", force=True)
+        auto_rig_script.LOGGER.info("Worker ready, template snapshot: %s",
+                                    self.snapshot_path)
+
+    def stop(self):
+        """Delete the template snapshot and shut Maya down."""
+        import maya.standalone
+
+        if self.snapshot_path and os.path.exists(self.snapshot_path):
+            os.remove(self.snapshot_path)
+        maya.standalone.uninitialize()
+
+    def reset(self):
+        """Restore the clean scene holding only the template."""
+        self.rig.cmds.file(self.snapshot_path, open=True, force=True)
+
+    def run_job(self, job):
+        """
+        Rig one asset.
+
+        Args:
+            job (dict): asset_id, and optionally geometry_mode,
+                        self_contained, checkpoint_dir, dedupe_index (see
+                        auto_rig_prop) and output_path (the rig is slimmed
+                        and saved there, as .ma or .mb following the
+                        extension).
+
+        Returns:
+            dict: status ("done" or "failed"), asset_name or error, seconds.
+        """
+        start = time.perf_counter()
+        try:
+            self.reset()
+            asset_name = self.rig.auto_rig_prop(
+                geometry_mode=job.get("geometry_mode", "import"),
+                self_contained=job.get("self_contained", False),
+                interactive=False,
+                asset_id=job["asset_id"],
+                registry=self.registry,
+                checkpoint_dir=job.get("checkpoint_dir"),
+                job=self.rig_job,
+                output_path=job.get("output_path"),
+                dedupe_index=job.get("dedupe_index"))
+            result = {"status": "done", "asset_name": asset_name}
+        except Exception as e:
+            self.rig.LOGGER.exception("Job %s failed.", job)
+            result = {"status": "failed", "error": str(e)}
+        finally:
+            self.jobs_done += 1
+
+        result["seconds"] = time.perf_counter() - start
+        return result
+
+    def should_recycle(self):
+        """
+        Returns:
+            bool: True once the job count or memory threshold is reached.
+        """
+        if self.jobs_done >= self.max_jobs:
+            return True
+        memory = get_memory_usage_mb()
+        return bool(self.max_memory_mb and memory
+                    and memory >= self.max_memory_mb)
+
+    def serve(self, address=DEFAULT_ADDRESS):
+        """
+        Accept jobs on a local socket until the worker must be recycled.
+
+        Args:
+            address (tuple): (host, port) to listen on.
+
+        Returns:
+            int: RECYCLE_EXIT_CODE.
+        """
+        with Listener(address, authkey=get_authkey(create=True)) \
+                as listener:
+            while not self.should_recycle():
+                try:
+                    with listener.accept() as connection:
+                        job = connection.recv()
+                        connection.send(self.run_job(job))
+                except (AuthenticationError, EOFError, OSError) as e:
+                    # A client left or failed to authenticate, keep serving
+                    self.rig.LOGGER.warning("Worker connection dropped: %s",
+                                            e)
+        self.rig.LOGGER.info("Worker recycling after %d jobs.",
+                             self.jobs_done)
+        return RECYCLE_EXIT_CODE
+
+
+def submit_rig_job(asset_id, address=DEFAULT_ADDRESS, **options):
+    """
+    Send a job to a running worker and wait for its result.
+
+    Args:
+        asset_id (int): The ID of the asset in ShotGrid.
+        address (tuple): (host, port) of the worker.
+        **options: geometry_mode, self_contained, checkpoint_dir,
+                   dedupe_index, output_path.
+
+    Returns:
+        dict: The result of RigWorker.run_job.
+    """
+    with Client(address, authkey=get_authkey()) as connection:
+        job = dict(options, asset_id=asset_id)
+        connection.send(job)
+        return connection.recv()
+
+
+def supervise(mayapy, port, max_jobs, max_memory_mb):
+    """
+    Run workers one after the other, starting a new one each time the
+    previous recycles itself.
+
+    Args:
+        mayapy (str): Path to the mayapy executable.
+        port (int): Port the workers listen on.
+        max_jobs (int): Jobs per worker process.
+        max_memory_mb (float): Memory threshold per worker process.
+
+    Returns:
+        int: Exit code of the last worker when it did not recycle.
+    """
+    command = [mayapy, os.path.abspath(__file__), "--serve",
+               "--port", str(port), "--max-jobs", str(max_jobs)]
+    if max_memory_mb:
+        command.extend(["--max-memory", str(max_memory_mb)])
+    while True:
+        return_code = subprocess.call(command)
+        if return_code != RECYCLE_EXIT_CODE:
+            return return_code
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Warm Maya worker for auto_rig_prop jobs.")
+    parser.add_argument("--serve", action="store_true",
+                        help="Run the worker in this (mayapy) process.")
+    parser.add_argument("--mayapy", default="mayapy",
+                        help="mayapy executable used by the supervisor.")
+    parser.add_argument("--port", type=int, default=DEFAULT_ADDRESS[1])
+    parser.add_argument("--max-jobs", type=int, default=50)
+    parser.add_argument("--max-memory", type=float, default=None,
+                        help="Recycle above this resident memory (MB), "
+                             "needs psutil.")
+    arguments = parser.parse_args()
+
+    if not arguments.serve:
+        # Created once before the workers start, clients read the same file
+        get_authkey(create=True)
+        return supervise(arguments.mayapy, arguments.port,
+                         arguments.max_jobs, arguments.max_memory)
+
+    worker = RigWorker(arguments.max_jobs, arguments.max_memory)
+    worker.start()
+    try:
+        return worker.serve((DEFAULT_ADDRESS[0], arguments.port))
+    finally:
+        worker.stop()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,201 @@
+import os
+import sqlite3
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "core"))
+
+import rig_queue  # noqa: E402
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return rig_queue.RigJobQueue(str(tmp_path / "queue.db"))
+
+
+class FakeWorker(object):
+    """Stands in for rig_worker.RigWorker, runs a callback per job."""
+
+    def __init__(self, run=None, status="done"):
+        self.run = run
+        self.status = status
+        self.jobs = []
+
+    def should_recycle(self):
+        return False
+
+    def run_job(self, job):
+        self.jobs.append(dict(job))
+        if self.run:
+            self.run(job)
+        if self.status == "done" and job.get("output_path"):
+            with open(job["output_path"], "w") as rig_file:
+                rig_file.write(str(job["asset_id"]))
+        return {"status": self.status, "error": "boom"}
+
+
+def test_enqueue_ignores_queued_assets(queue):
+    assert queue.enqueue(1)
+    assert not queue.enqueue(1)
+    assert queue.status() == {"pending": 1}
+
+
+def test_enqueue_force_requeues_done_assets(queue):
+    queue.enqueue(1)
+    queue.claim("a")
+    queue.complete(1, "a")
+    assert queue.enqueue(1, force=True)
+    assert queue.claim("b")["attempts"] == 1
+
+
+def test_claim_highest_priority_first(queue):
+    queue.enqueue(1, priority=1)
+    queue.enqueue(2, priority=10)
+    queue.enqueue(3, priority=5, geometry_mode="reference")
+    assert queue.claim("a")["asset_id"] == 2
+    assert queue.claim("a") == {"asset_id": 3, "attempts": 1,
+                                "geometry_mode": "reference"}
+    assert queue.claim("a")["asset_id"] == 1
+    assert queue.claim("a") is None
+
+
+def test_claim_skips_jobs_needing_more_memory(queue):
+    queue.enqueue(1, priority=10, memory_mb=64000)
+    queue.enqueue(2, priority=1, memory_mb=4000)
+    assert queue.claim("small", max_memory_mb=8000)["asset_id"] == 2
+    assert queue.claim("small", max_memory_mb=8000) is None
+    assert queue.claim("big")["asset_id"] == 1
+
+
+def test_expired_lease_is_claimed_again(tmp_path):
+    queue = rig_queue.RigJobQueue(str(tmp_path / "queue.db"),
+                                  lease_seconds=-1)
+    queue.enqueue(1)
+    queue.claim("a")
+    job = queue.claim("b")
+    assert job["asset_id"] == 1 and job["attempts"] == 2
+    assert not queue.heartbeat(1, "a")
+    assert queue.heartbeat(1, "b")
+
+
+def test_expired_lease_of_exhausted_job_fails(tmp_path):
+    queue = rig_queue.RigJobQueue(str(tmp_path / "queue.db"),
+                                  lease_seconds=-1, max_attempts=1)
+    queue.enqueue(1)
+    queue.claim("a")
+    assert queue.claim("b") is None
+    assert queue.status() == {"failed": 1}
+
+
+def test_fail_retries_until_max_attempts(tmp_path):
+    queue = rig_queue.RigJobQueue(str(tmp_path / "queue.db"),
+                                  max_attempts=2)
+    queue.enqueue(1)
+    queue.claim("a")
+    assert queue.fail(1, "a", "first")
+    queue.claim("a")
+    assert not queue.fail(1, "a", "second")
+    assert queue.status() == {"failed": 1}
+
+
+def test_complete_is_idempotent(queue):
+    queue.enqueue(1)
+    queue.claim("a")
+    assert queue.complete(1, "a", {"asset_name": "chair"})
+    assert not queue.complete(1, "a")
+    assert not queue.fail(1, "a", "late")
+    assert queue.status() == {"done": 1}
+
+
+def test_complete_after_lost_lease_is_ignored(tmp_path):
+    queue = rig_queue.RigJobQueue(str(tmp_path / "queue.db"),
+                                  lease_seconds=-1)
+    queue.enqueue(1)
+    queue.claim("a")
+    queue.claim("b")
+    assert not queue.complete(1, "a")
+    assert queue.complete(1, "b")
+
+
+def test_old_queue_files_are_migrated(tmp_path):
+    path = str(tmp_path / "queue.db")
+    connection = sqlite3.connect(path)
+    connection.execute(
+        "CREATE TABLE jobs (asset_id INTEGER PRIMARY KEY, "
+        "options TEXT NOT NULL DEFAULT '{}', "
+        "state TEXT NOT NULL DEFAULT 'pending', "
+        "priority REAL NOT NULL DEFAULT 0, "
+        "attempts INTEGER NOT NULL DEFAULT 0, lease_owner TEXT, "
+        "lease_expires REAL, result TEXT, error TEXT, updated_at REAL)")
+    connection.execute("INSERT INTO jobs (asset_id) VALUES (1)")
+    connection.commit()
+    connection.close()
+
+    queue = rig_queue.RigJobQueue(path)
+    assert queue.claim("a", max_memory_mb=1000)["asset_id"] == 1
+
+
+def test_enqueue_plans_orders_longest_first(queue):
+    plans = [{"asset_id": 1, "cost": {"seconds": 5, "memory_mb": 100}},
+             {"asset_id": 2, "cost": {"seconds": 50, "memory_mb": 100}}]
+    assert rig_queue.enqueue_plans(queue, plans) == 2
+    assert queue.claim("a")["asset_id"] == 2
+
+
+def test_consume_completes_and_moves_output(queue, tmp_path):
+    queue.enqueue(1)
+    worker = FakeWorker()
+    assert rig_queue.consume(queue, worker, str(tmp_path),
+                             idle_seconds=0) == 1
+    assert worker.jobs[0]["output_path"] != str(tmp_path / "1_rig.mb")
+    assert (tmp_path / "1_rig.mb").read_text() == "1"
+    assert not [name for name in os.listdir(tmp_path) if "partial" in name]
+    assert queue.status() == {"done": 1}
+
+
+def test_consume_fails_and_discards_output(queue, tmp_path):
+    queue.enqueue(1)
+    worker = FakeWorker(status="failed")
+    assert rig_queue.consume(queue, worker, str(tmp_path),
+                             idle_seconds=0) == queue.max_attempts
+    assert not (tmp_path / "1_rig.mb").exists()
+    with sqlite3.connect(queue.path) as connection:
+        state, error = connection.execute(
+            "SELECT state, error FROM jobs").fetchone()
+    assert (state, error) == ("failed", "boom")
+
+
+def test_consume_discards_result_of_lost_lease(queue, tmp_path):
+    queue.enqueue(1)
+
+    def steal(job):
+        # The lease expires and another host re-claims the job meanwhile
+        with sqlite3.connect(queue.path) as connection:
+            connection.execute("UPDATE jobs SET lease_expires = 0")
+        queue.claim("other")
+
+    assert rig_queue.consume(queue, FakeWorker(run=steal), str(tmp_path),
+                             idle_seconds=0) == 1
+    assert not (tmp_path / "1_rig.mb").exists()
+    assert not [name for name in os.listdir(tmp_path) if "partial" in name]
+    with sqlite3.connect(queue.path) as connection:
+        row = connection.execute(
+            "SELECT state, lease_owner, result FROM jobs").fetchone()
+    assert row == ("running", "other", None)
+
+
+def test_supervise_restarts_recycled_consumers(monkeypatch):
+    return_codes = [75, 75, 0]
+    commands = []
+
+    def call(command):
+        commands.append(command)
+        return return_codes.pop(0)
+
+    monkeypatch.setattr(rig_queue.subprocess, "call", call)
+    assert rig_queue.supervise("mayapy", ["queue.db", "consume", "--run"]) \
+        == 0
+    assert len(commands) == 3
+    assert commands[0][0] == "mayapy"
+    assert commands[0][2:] == ["queue.db", "consume", "--run"]